@@ -70,8 +70,10 @@ CREATE INDEX IF NOT EXISTS idx_case_event_procedure
     ON outpatient_case_event (procedure_type);
 CREATE INDEX IF NOT EXISTS idx_case_event_checkin
     ON outpatient_case_event (checkin_time);
-CREATE INDEX IF NOT EXISTS idx_case_event_created
-    ON outpatient_case_event (created_at);
+-- Matches the ETL watermark scan (WHERE created_at > $1 ORDER BY created_at, event_id)
+DROP INDEX IF EXISTS idx_case_event_created;
+CREATE INDEX IF NOT EXISTS idx_case_event_created_event
+    ON outpatient_case_event (created_at, event_id);
 CREATE INDEX IF NOT EXISTS idx_case_event_status
     ON outpatient_case_event (case_status);
 
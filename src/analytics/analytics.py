@@ -11,21 +11,27 @@ automatic CPU fallback when GPU is unavailable.
 """
 
 import argparse
+import hashlib
 import json
 import logging
 import os
 import sys
 import warnings
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone
 from typing import Any, Dict, List, Optional, Tuple
 
 import numpy as np
 
-# Try GPU-accelerated libraries first, fall back to CPU
+# Try GPU-accelerated libraries first, fall back to CPU.
+# cudf.pandas must be installed before pandas is imported so that every
+# pd.* call below dispatches to cuDF, falling back to pandas per-operation.
 GPU_AVAILABLE = False
 try:
     import cudf
+    import cudf.pandas
     import cuml
+    cudf.pandas.install()
     GPU_AVAILABLE = True
     logger_gpu = "GPU (RAPIDS)"
 except ImportError:
@@ -33,6 +39,8 @@ except ImportError:
 
 import pandas as pd
 
+from src.analytics.report import atomic_open, write_gzip_sibling
+
 try:
     import xgboost as xgb
     XGB_AVAILABLE = True
@@ -41,101 +49,314 @@ except ImportError:
     XGB_AVAILABLE = False
 
 try:
-    from sklearn.model_selection import train_test_split
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    from numba import njit, prange
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+try:
     from sklearn.metrics import mean_absolute_error, r2_score, roc_auc_score
-    from sklearn.preprocessing import LabelEncoder
     SKLEARN_AVAILABLE = True
 except ImportError:
     SKLEARN_AVAILABLE = False
 
+if GPU_AVAILABLE:
+    # Score on the device with cuML so predictions and targets stay in GPU memory
+    from cuml.metrics import mean_absolute_error, r2_score, roc_auc_score
+
 warnings.filterwarnings("ignore", category=FutureWarning)
 logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
 logger = logging.getLogger(__name__)
 
+# Low-cardinality string columns read straight into categoricals so they stay
+# dictionary-encoded through the CSV reader (pandas or cuDF) and every groupby.
+CATEGORY_COLUMNS = ["facility_id", "procedure_type", "anesthesia_type", "case_status"]
+
+
+def _read_csv(input_path: str) -> pd.DataFrame:
+    """Parse a case-event CSV, typing timestamps and categorical columns."""
+    # Under cudf.pandas this dispatches to libcudf's CSV reader, so parsing
+    # and datetime conversion happen on the GPU.
+    return pd.read_csv(input_path, parse_dates=[
+        "scheduled_start_time", "checkin_time", "preop_start_time",
+        "op_start_time", "postop_start_time", "discharge_time",
+    ], dtype={col: "category" for col in CATEGORY_COLUMNS})
+
+
+# Parquet schema metadata key holding the source CSV's path, size and mtime_ns
+CSV_CACHE_KEY = b"outpatient_csv_source"
+
+
+def _csv_cache_key(input_path: str) -> bytes:
+    st = os.stat(input_path)
+    return f"{os.path.abspath(input_path)}:{st.st_size}:{st.st_mtime_ns}".encode()
+
+
+def _load_csv_cached(input_path: str, cache_dir: str) -> pd.DataFrame:
+    """Load a CSV via a Parquet copy in ``cache_dir``, writing it on first read.
+
+    The copy records the CSV's path, size and mtime_ns in its schema metadata
+    and is reused only while all three still match. Parquet keeps timestamps
+    as int64 and categoricals dictionary-encoded, so reloads skip text
+    parsing entirely.
+    """
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        return _read_csv(input_path)
+
+    key = _csv_cache_key(input_path)
+    name = hashlib.blake2b(os.path.abspath(input_path).encode(), digest_size=16).hexdigest()
+    cache_path = os.path.join(cache_dir, name + ".parquet")
+    try:
+        if (pq.read_schema(cache_path).metadata or {}).get(CSV_CACHE_KEY) == key:
+            logger.info("Reading columnar cache %s", cache_path)
+            return pd.read_parquet(cache_path)
+    except (OSError, pa.ArrowException):
+        pass  # missing or unreadable; rebuilt below
+
+    df = _read_csv(input_path)
+    try:
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        table = table.replace_schema_metadata({**(table.schema.metadata or {}), CSV_CACHE_KEY: key})
+        os.makedirs(cache_dir, exist_ok=True)
+        with atomic_open(cache_path, "wb") as f:
+            pq.write_table(table, f)
+    except (OSError, pa.ArrowException) as e:
+        logger.info("Parquet cache not written (%s)", e)
+    return df
+
+
+def _read_postgres(dsn: str, chunk_rows: int = 100_000) -> pd.DataFrame:
+    """Stream the case-event table through a server-side cursor.
+
+    Rows arrive ``chunk_rows`` at a time and are turned into frames as they
+    come, so the client never holds the full result as Python tuples.
+    """
+    import psycopg2
+    conn = psycopg2.connect(dsn)
+    try:
+        chunks = []
+        with conn.cursor(name="analytics_load") as cur:
+            cur.itersize = chunk_rows
+            cur.execute("SELECT * FROM outpatient_case_event")
+            while True:
+                rows = cur.fetchmany(chunk_rows)
+                columns = [d[0] for d in cur.description]
+                if not rows:
+                    break
+                chunks.append(pd.DataFrame.from_records(rows, columns=columns))
+    finally:
+        conn.close()
+
+    df = pd.concat(chunks, ignore_index=True) if chunks else pd.DataFrame(columns=columns)
+    present = [c for c in CATEGORY_COLUMNS if c in df.columns]
+    df[present] = df[present].astype("category")
+    return df
 
-def load_data(input_path: str) -> pd.DataFrame:
-    """Load case event data from CSV or PostgreSQL connection string."""
+
+def load_data(input_path: str, csv_cache_dir: Optional[str] = None) -> pd.DataFrame:
+    """Load case event data from CSV, Parquet, or a PostgreSQL connection string.
+
+    With ``csv_cache_dir``, CSV inputs are reloaded from a Parquet copy kept there.
+    """
     if input_path.startswith("postgresql://"):
         try:
-            import psycopg2
-            import io
-            conn = psycopg2.connect(input_path)
-            df = pd.read_sql("SELECT * FROM outpatient_case_event", conn)
-            conn.close()
+            df = _read_postgres(input_path)
         except Exception as e:
             logger.error("Failed to load from DB: %s", e)
             raise
+    elif input_path.endswith(".csv") and csv_cache_dir:
+        df = _load_csv_cached(input_path, csv_cache_dir)
+    elif input_path.endswith(".parquet"):
+        df = pd.read_parquet(input_path)
+        present = [c for c in CATEGORY_COLUMNS if c in df.columns]
+        df[present] = df[present].astype("category")
     else:
-        df = pd.read_csv(input_path, parse_dates=[
-            "scheduled_start_time", "checkin_time", "preop_start_time",
-            "op_start_time", "postop_start_time", "discharge_time",
-        ])
+        df = _read_csv(input_path)
     logger.info("Loaded %d records from %s (backend: %s)", len(df), input_path, logger_gpu)
     return df
 
 
+# int64 nanosecond value NumPy uses for NaT
+NAT_NS = np.iinfo(np.int64).min
+LATE_START_NS = np.int64(15 * 60 * 10**9)
+
+
+def _to_ns(col: pd.Series) -> np.ndarray:
+    """Return a timestamp column as int64 nanoseconds since the epoch (NaT -> NAT_NS)."""
+    if not pd.api.types.is_datetime64_any_dtype(col):
+        col = pd.to_datetime(col)
+    return col.to_numpy(dtype="datetime64[ns]").view("i8")
+
+
+def _p90(values) -> float:
+    """90th percentile with linear interpolation, ignoring NaN.
+
+    Uses an O(n) ``np.partition`` selection of the two bracketing order
+    statistics rather than sorting the whole array.
+    """
+    a = np.asarray(values, dtype="f8")
+    a = a[~np.isnan(a)]
+    if a.size == 0:
+        return np.nan
+    pos = 0.9 * (a.size - 1)
+    k = int(pos)
+    if k + 1 == a.size:
+        return float(np.partition(a, k)[k])
+    lo, hi = np.partition(a, [k, k + 1])[[k, k + 1]]
+    return float(lo + (pos - k) * (hi - lo))
+
+
+def _span_minutes_np(ns: np.ndarray, start_idx: np.ndarray, end_idx: np.ndarray) -> np.ndarray:
+    """Minutes between paired columns of an (N, K) int64 ns matrix; NaN where either is NaT."""
+    starts = ns[:, start_idx]
+    ends = ns[:, end_idx]
+    minutes = (ends - starts) / 60e9
+    minutes[(starts == NAT_NS) | (ends == NAT_NS)] = np.nan
+    return minutes
+
+
+def _late_start_flags_np(op_ns: np.ndarray, sched_ns: np.ndarray) -> np.ndarray:
+    """1 where the op started more than 15 minutes after schedule, else 0 (int8)."""
+    late = (op_ns > sched_ns + LATE_START_NS) & (sched_ns != NAT_NS) & (op_ns != NAT_NS)
+    return late.astype("int8")
+
+
+if NUMBA_AVAILABLE:
+    # Single-pass parallel versions of the two kernels above for the CPU path;
+    # eager signatures compile at import instead of on first call.
+    @njit("float64[:, :](int64[:, :], int64[:], int64[:])", parallel=True, cache=True)
+    def _span_minutes(ns, start_idx, end_idx):
+        out = np.empty((ns.shape[0], start_idx.shape[0]))
+        for i in prange(ns.shape[0]):
+            for j in range(start_idx.shape[0]):
+                start = ns[i, start_idx[j]]
+                end = ns[i, end_idx[j]]
+                if start == NAT_NS or end == NAT_NS:
+                    out[i, j] = np.nan
+                else:
+                    out[i, j] = (end - start) / 60e9
+        return out
+
+    @njit("int8[:](int64[:], int64[:])", parallel=True, cache=True)
+    def _late_start_flags(op_ns, sched_ns):
+        out = np.empty(op_ns.shape[0], dtype=np.int8)
+        for i in prange(op_ns.shape[0]):
+            op = op_ns[i]
+            sched = sched_ns[i]
+            out[i] = 1 if op != NAT_NS and sched != NAT_NS and op > sched + LATE_START_NS else 0
+        return out
+else:
+    _span_minutes = _span_minutes_np
+    _late_start_flags = _late_start_flags_np
+
+
+# Derived duration columns as (name, start column index, end column index)
+# into the time_cols ordering used by compute_durations.
+DURATION_SPANS = [
+    ("dur_checkin_to_preop", 0, 1),
+    ("dur_preop_to_op", 1, 2),
+    ("dur_op_to_postop", 2, 3),
+    ("dur_postop_to_discharge", 3, 4),
+    ("dur_total", 0, 4),
+]
+
+
 def compute_durations(df: pd.DataFrame) -> pd.DataFrame:
-    """Compute derived duration columns if not already present."""
+    """Return ``df`` with derived duration columns added; the input frame is not modified."""
     time_cols = ["checkin_time", "preop_start_time", "op_start_time",
                  "postop_start_time", "discharge_time"]
-    for col in time_cols:
-        if not pd.api.types.is_datetime64_any_dtype(df[col]):
-            df[col] = pd.to_datetime(df[col])
+    # Shallow copy: new columns land on the copy only, and no data is duplicated
+    df = df.copy(deep=False)
+    pending = [c for c in time_cols if not pd.api.types.is_datetime64_any_dtype(df[c])]
+    if pending:
+        df[pending] = df[pending].apply(pd.to_datetime)
 
     if "dur_checkin_to_preop" not in df.columns:
-        df["dur_checkin_to_preop"] = (df["preop_start_time"] - df["checkin_time"]).dt.total_seconds() / 60.0
-        df["dur_preop_to_op"] = (df["op_start_time"] - df["preop_start_time"]).dt.total_seconds() / 60.0
-        df["dur_op_to_postop"] = (df["postop_start_time"] - df["op_start_time"]).dt.total_seconds() / 60.0
-        df["dur_postop_to_discharge"] = (df["discharge_time"] - df["postop_start_time"]).dt.total_seconds() / 60.0
-        df["dur_total"] = (df["discharge_time"] - df["checkin_time"]).dt.total_seconds() / 60.0
+        # One (N, 5) int64 nanosecond matrix and a single subtraction for all
+        # five spans, instead of a timedelta Series + .dt pass per column.
+        ns = np.column_stack([_to_ns(df[c]) for c in time_cols])
+        names, start_idx, end_idx = zip(*DURATION_SPANS)
+        minutes = _span_minutes(ns, np.array(start_idx, dtype=np.int64), np.array(end_idx, dtype=np.int64))
+        df[list(names)] = minutes
 
     return df
 
 
-def compute_aggregates(df: pd.DataFrame) -> pd.DataFrame:
-    """Compute aggregate metrics per facility and procedure type."""
-    completed = df[df["case_status"] == "completed"].copy()
+def compute_aggregates(completed: pd.DataFrame) -> pd.DataFrame:
+    """Compute aggregate metrics per facility and procedure type over completed cases."""
 
     duration_cols = [
         "dur_checkin_to_preop", "dur_preop_to_op",
         "dur_op_to_postop", "dur_postop_to_discharge", "dur_total",
     ]
 
+    keyed = completed["facility_id"].notna() & completed["procedure_type"].notna()
+    if not keyed.all():
+        completed = completed[keyed]
+
+    # Group on one packed int64 key, (facility code << 32) | procedure code,
+    # instead of hashing two string columns per row. Categories are sorted, so
+    # key order matches the (facility, procedure) order of a two-column groupby.
+    facility = completed["facility_id"].astype("category")
+    procedure = completed["procedure_type"].astype("category")
+    key = (facility.cat.codes.to_numpy(dtype="int64") << 32) | procedure.cat.codes.to_numpy(dtype="int64")
+
     agg_dict = {}
     for col in duration_cols:
         agg_dict[f"{col}_mean"] = (col, "mean")
         agg_dict[f"{col}_median"] = (col, "median")
-        agg_dict[f"{col}_p90"] = (col, lambda x: np.percentile(x.dropna(), 90) if len(x.dropna()) > 0 else np.nan)
         agg_dict[f"{col}_std"] = (col, "std")
     agg_dict["case_volume"] = ("event_id", "count")
 
-    aggs = completed.groupby(["facility_id", "procedure_type"]).agg(**agg_dict).reset_index()
+    grouped = completed.groupby(key)
+    aggs = grouped.agg(**agg_dict)
+
+    # p90 via the native groupby quantile kernel rather than a per-group
+    # Python lambda, which would also force cudf.pandas back onto the CPU.
+    p90 = grouped[duration_cols].quantile(0.9)
+    p90.columns = [f"{col}_p90" for col in duration_cols]
+    aggs = aggs.join(p90)
+
+    column_order = [f"{col}_{stat}" for col in duration_cols for stat in ("mean", "median", "p90", "std")]
+    aggs = aggs[column_order + ["case_volume"]]
 
     # Late start rate
     if "scheduled_start_time" in completed.columns:
-        completed["late_start"] = (
-            pd.to_datetime(completed["op_start_time"]) >
-            pd.to_datetime(completed["scheduled_start_time"]) + pd.Timedelta(minutes=15)
-        ).astype(int)
-        late_rate = completed.groupby(["facility_id", "procedure_type"])["late_start"].mean().reset_index()
-        late_rate.columns = ["facility_id", "procedure_type", "late_start_rate"]
-        aggs = aggs.merge(late_rate, on=["facility_id", "procedure_type"], how="left")
+        sched_ns = _to_ns(completed["scheduled_start_time"])
+        op_ns = _to_ns(completed["op_start_time"])
+        aggs["late_start_rate"] = pd.Series(_late_start_flags(op_ns, sched_ns)).groupby(key).mean()
+
+    group_keys = aggs.index.to_numpy()
+    aggs.insert(0, "facility_id", facility.cat.categories[group_keys >> 32])
+    aggs.insert(1, "procedure_type", procedure.cat.categories[group_keys & 0xFFFFFFFF])
+    aggs = aggs.reset_index(drop=True)
 
     logger.info("Computed aggregates: %d facility-procedure combinations", len(aggs))
     return aggs
 
 
-def prepare_features(df: pd.DataFrame) -> Tuple[pd.DataFrame, List[str], Dict[str, Any]]:
-    """Prepare feature matrix for ML models."""
-    completed = df[df["case_status"] == "completed"].copy()
+def prepare_features(completed: pd.DataFrame) -> Tuple[pd.DataFrame, List[str], Dict[str, Any]]:
+    """Prepare feature matrix for ML models, adding feature columns to ``completed`` in place."""
 
-    # Encode categoricals
+    # Encode categoricals as their dictionary codes; encoders map code -> label
     encoders = {}
     for col in ["facility_id", "procedure_type", "anesthesia_type"]:
         if col in completed.columns:
-            le = LabelEncoder()
-            completed[f"{col}_enc"] = le.fit_transform(completed[col].fillna("unknown"))
-            encoders[col] = le
+            cat = completed[col].astype("category")
+            if cat.isna().any():
+                if "unknown" not in cat.cat.categories:
+                    cat = cat.cat.add_categories(["unknown"])
+                cat = cat.fillna("unknown")
+            completed[f"{col}_enc"] = cat.cat.codes.astype("int32")
+            encoders[col] = dict(enumerate(cat.cat.categories))
 
     # Time features
     completed["checkin_hour"] = pd.to_datetime(completed["checkin_time"]).dt.hour
@@ -151,8 +372,72 @@ def prepare_features(df: pd.DataFrame) -> Tuple[pd.DataFrame, List[str], Dict[st
     return completed, feature_cols, encoders
 
 
-def train_discharge_predictor(df: pd.DataFrame, feature_cols: List[str]) -> Optional[Dict]:
-    """Train XGBoost model to predict total case duration (discharge time)."""
+def _train_test_split(X: pd.DataFrame, y: pd.Series, test_size: float = 0.2, seed: int = 42):
+    """Shuffle-split a feature frame and target by one permutation of row positions.
+
+    Only the index array is shuffled on the host; the ``iloc`` gathers run
+    wherever the frames live (cuDF under cudf.pandas).
+    """
+    n = len(X)
+    n_test = int(np.ceil(test_size * n))
+    idx = np.random.default_rng(seed).permutation(n)
+    train_idx, test_idx = idx[n_test:], idx[:n_test]
+    return X.iloc[train_idx], X.iloc[test_idx], y.iloc[train_idx], y.iloc[test_idx]
+
+
+# Share of the training rows held out for early stopping
+VALIDATION_SIZE = 0.2
+
+
+def _train_booster(
+    params: Dict[str, Any],
+    X_train, y_train, X_test, y_test,
+    feature_names: List[str],
+) -> Tuple[Any, np.ndarray, Dict[str, float], int, int]:
+    """Train an XGBoost booster on QuantileDMatrix inputs with early stopping.
+
+    Early stopping watches a validation split carved from the training rows,
+    so the test set is only ever scored, never used to pick the iteration.
+    The matrices are built straight from the frames passed in, so under
+    cudf.pandas with ``device="cuda"`` the features never leave the GPU.
+    Returns the booster, test-set predictions (a CuPy array on GPU),
+    normalised gain importance, and the fit and validation row counts.
+    """
+    params = dict(params)
+    num_rounds = params.pop("n_estimators")
+    max_bin = params.get("max_bin", 256)
+    X_fit, X_val, y_fit, y_val = _train_test_split(X_train, y_train, test_size=VALIDATION_SIZE)
+    dtrain = xgb.QuantileDMatrix(X_fit, y_fit, feature_names=feature_names, max_bin=max_bin)
+    dval = xgb.QuantileDMatrix(
+        X_val, y_val, ref=dtrain, feature_names=feature_names, max_bin=max_bin,
+    )
+    dtest = xgb.QuantileDMatrix(
+        X_test, y_test, ref=dtrain, feature_names=feature_names, max_bin=max_bin,
+    )
+    booster = xgb.train(
+        params, dtrain, num_boost_round=num_rounds,
+        evals=[(dval, "validation")], early_stopping_rounds=20, verbose_eval=False,
+    )
+    iteration_range = (0, booster.best_iteration + 1)
+    if GPU_AVAILABLE:
+        # inplace_predict on device-resident data returns a CuPy array
+        y_pred = booster.inplace_predict(X_test, iteration_range=iteration_range)
+    else:
+        y_pred = booster.predict(dtest, iteration_range=iteration_range)
+
+    gain = booster.get_score(importance_type="gain")
+    total_gain = sum(gain.values()) or 1.0
+    importance = {name: gain.get(name, 0.0) / total_gain for name in feature_names}
+    return booster, y_pred, importance, len(X_fit), len(X_val)
+
+
+def train_discharge_predictor(
+    df: pd.DataFrame, feature_cols: List[str], nthread: Optional[int] = None,
+) -> Optional[Dict]:
+    """Train XGBoost model to predict total case duration (discharge time).
+
+    ``nthread`` caps XGBoost's CPU threads (default: all cores).
+    """
     if not XGB_AVAILABLE:
         logger.warning("XGBoost not available, skipping discharge predictor")
         return None
@@ -163,10 +448,12 @@ def train_discharge_predictor(df: pd.DataFrame, feature_cols: List[str]) -> Opti
         logger.warning("Insufficient data for training: %d rows", len(valid))
         return None
 
-    X = valid[feature_cols].values
-    y = valid[target].values
+    # float32 halves the feature matrix (and its host-to-device copy); XGBoost
+    # bins the values into histograms anyway.
+    X = valid[feature_cols].astype("float32")
+    y = valid[target].astype("float32")
 
-    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+    X_train, X_test, y_train, y_test = _train_test_split(X, y)
 
     params = {
         "objective": "reg:squarederror",
@@ -176,6 +463,7 @@ def train_discharge_predictor(df: pd.DataFrame, feature_cols: List[str]) -> Opti
         "subsample": 0.8,
         "colsample_bytree": 0.8,
         "random_state": 42,
+        "max_bin": 64,
     }
 
     if GPU_AVAILABLE:
@@ -187,52 +475,52 @@ def train_discharge_predictor(df: pd.DataFrame, feature_cols: List[str]) -> Opti
     else:
         params["tree_method"] = "hist"
         logger.info("Training discharge predictor on CPU")
+    if nthread is not None:
+        params["nthread"] = nthread
 
-    model = xgb.XGBRegressor(**params)
-    model.fit(X_train, y_train, eval_set=[(X_test, y_test)], verbose=False)
-
-    y_pred = model.predict(X_test)
-    mae = mean_absolute_error(y_test, y_pred)
-    r2 = r2_score(y_test, y_pred)
+    _, y_pred, importance, n_fit, n_val = _train_booster(params, X_train, y_train, X_test, y_test, feature_cols)
+    mae = float(mean_absolute_error(y_test, y_pred))
+    r2 = float(r2_score(y_test, y_pred))
 
     logger.info("Discharge predictor: MAE=%.2f min, R²=%.4f", mae, r2)
 
-    # Feature importance
-    importance = dict(zip(feature_cols, model.feature_importances_.tolist()))
-
     return {
         "model_type": "XGBRegressor",
         "target": target,
         "mae_minutes": round(mae, 2),
         "r2_score": round(r2, 4),
         "feature_importance": importance,
-        "n_train": len(X_train),
+        "n_train": n_fit,
+        "n_val": n_val,
         "n_test": len(X_test),
         "gpu_used": GPU_AVAILABLE,
     }
 
 
-def train_extended_recovery_classifier(df: pd.DataFrame, feature_cols: List[str]) -> Optional[Dict]:
-    """Train classifier for extended recovery (postop > p90 duration)."""
+def train_extended_recovery_classifier(
+    df: pd.DataFrame, feature_cols: List[str], nthread: Optional[int] = None,
+) -> Optional[Dict]:
+    """Train classifier for extended recovery (postop > p90 duration).
+
+    ``nthread`` caps XGBoost's CPU threads (default: all cores).
+    """
     if not XGB_AVAILABLE:
         logger.warning("XGBoost not available, skipping recovery classifier")
         return None
 
-    completed = df[df["case_status"] == "completed"].copy()
-    if "dur_postop_to_discharge" not in completed.columns or len(completed) < 100:
+    if "dur_postop_to_discharge" not in df.columns or len(df) < 100:
         return None
 
-    p90 = completed["dur_postop_to_discharge"].quantile(0.90)
-    completed["extended_recovery"] = (completed["dur_postop_to_discharge"] > p90).astype(int)
+    p90 = _p90(df["dur_postop_to_discharge"])
 
     # Use only pre-postop features for prediction
     clf_features = [c for c in feature_cols if "postop" not in c]
-    valid = completed.dropna(subset=clf_features + ["extended_recovery"])
+    valid = df.dropna(subset=clf_features)
 
-    X = valid[clf_features].values
-    y = valid["extended_recovery"].values
+    X = valid[clf_features].astype("float32")
+    y = (valid["dur_postop_to_discharge"] > p90).astype("int32")
 
-    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+    X_train, X_test, y_train, y_test = _train_test_split(X, y)
 
     params = {
         "objective": "binary:logistic",
@@ -241,19 +529,19 @@ def train_extended_recovery_classifier(df: pd.DataFrame, feature_cols: List[str]
         "n_estimators": 100,
         "scale_pos_weight": (y_train == 0).sum() / max((y_train == 1).sum(), 1),
         "random_state": 42,
+        "max_bin": 64,
     }
     if GPU_AVAILABLE:
         params["tree_method"] = "hist"
         params["device"] = "cuda"
         params["n_estimators"] = 500
         params["max_depth"] = 8
+    if nthread is not None:
+        params["nthread"] = nthread
 
-    model = xgb.XGBClassifier(**params)
-    model.fit(X_train, y_train, eval_set=[(X_test, y_test)], verbose=False)
-
-    y_prob = model.predict_proba(X_test)[:, 1]
+    _, y_prob, _, n_fit, n_val = _train_booster(params, X_train, y_train, X_test, y_test, clf_features)
     try:
-        auc = roc_auc_score(y_test, y_prob)
+        auc = float(roc_auc_score(y_test, y_prob))
     except ValueError:
         auc = 0.0
 
@@ -265,15 +553,21 @@ def train_extended_recovery_classifier(df: pd.DataFrame, feature_cols: List[str]
         "p90_threshold_minutes": round(p90, 2),
         "auc_score": round(auc, 4),
         "features_used": clf_features,
-        "n_train": len(X_train),
+        "n_train": n_fit,
+        "n_val": n_val,
         "n_test": len(X_test),
         "gpu_used": GPU_AVAILABLE,
     }
 
 
-def generate_insights(df: pd.DataFrame, aggs: pd.DataFrame) -> List[Dict]:
+def generate_insights(
+    df: pd.DataFrame, aggs: pd.DataFrame, completed: Optional[pd.DataFrame] = None,
+) -> List[Dict]:
     """Generate actionable insights from the analysis.
 
+    ``completed`` is the completed-case subset of ``df``; it is derived here
+    when the caller has not already filtered it.
+
     Each insight includes:
       - type: category key
       - severity: "high" | "medium" | "info"
@@ -283,6 +577,8 @@ def generate_insights(df: pd.DataFrame, aggs: pd.DataFrame) -> List[Dict]:
       - action: specific recommended steps to take
     """
     insights = []
+    if completed is None:
+        completed = df[df["case_status"] == "completed"]
 
     # ---- 1. High-variance procedures (operational risk) ----
     if "dur_total_std" in aggs.columns:
@@ -452,12 +748,11 @@ def generate_insights(df: pd.DataFrame, aggs: pd.DataFrame) -> List[Dict]:
                     })
 
     # ---- 5. Facility-level summary ----
-    completed = df[df["case_status"] == "completed"]
-    for fac in sorted(completed["facility_id"].unique()):
-        fac_data = completed[completed["facility_id"] == fac]
-        avg_total = fac_data["dur_total"].mean()
-        p90_total = fac_data["dur_total"].quantile(0.9)
-        vol = len(fac_data)
+    fac_totals = completed.groupby("facility_id", observed=True)["dur_total"]
+    summary = fac_totals.agg(avg_total="mean", vol="size")
+    summary["p90_total"] = fac_totals.quantile(0.9)
+    for fac, avg_total, vol, p90_total in summary.itertuples():
+        vol = int(vol)
         insights.append({
             "type": "facility_summary",
             "severity": "info",
@@ -477,7 +772,7 @@ def generate_insights(df: pd.DataFrame, aggs: pd.DataFrame) -> List[Dict]:
 
     # ---- 6. Cancellation rate ----
     total = len(df)
-    canceled = len(df[df["case_status"] == "canceled"])
+    canceled = int((df["case_status"] == "canceled").sum())
     if total > 0:
         cancel_rate = canceled / total
         severity = "high" if cancel_rate > 0.05 else ("medium" if cancel_rate > 0.02 else "info")
@@ -527,9 +822,9 @@ def _run_gpu_hyperparam_sweep(df: pd.DataFrame, feature_cols: List[str]):
     if len(valid) < 100:
         return
 
-    X = valid[feature_cols].values
-    y = valid[target].values
-    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+    X = valid[feature_cols]
+    y = valid[target]
+    X_train, X_test, y_train, y_test = _train_test_split(X, y)
 
     configs = [
         {"max_depth": 6, "n_estimators": 800, "learning_rate": 0.05},
@@ -558,29 +853,57 @@ def _run_gpu_hyperparam_sweep(df: pd.DataFrame, feature_cols: List[str]):
     logger.info("GPU sweep complete — best MAE=%.2f min", best_mae)
 
 
-def run_analytics(input_path: str, output_dir: str):
+def _write_json(obj: Any, output_path: str):
+    """Write ``obj`` as indented JSON, using orjson when it is installed."""
+    if orjson is not None:
+        with atomic_open(output_path, "wb") as f:
+            f.write(orjson.dumps(
+                obj, default=str,
+                option=orjson.OPT_INDENT_2 | orjson.OPT_SERIALIZE_NUMPY,
+            ))
+    else:
+        with atomic_open(output_path, "w") as f:
+            json.dump(obj, f, indent=2, default=str)
+
+
+def run_analytics(input_path: str, output_dir: str, csv_cache_dir: Optional[str] = None):
     """Run the full analytics pipeline."""
     os.makedirs(output_dir, exist_ok=True)
 
     # Load and prepare data
-    df = load_data(input_path)
+    df = load_data(input_path, csv_cache_dir)
     df = compute_durations(df)
+    # case_status as a categorical makes status checks an int8 code compare;
+    # the completed subset is filtered once and shared by every stage below.
+    df["case_status"] = df["case_status"].astype("category")
+    completed = df[df["case_status"] == "completed"].copy()
 
     # Aggregates
-    aggs = compute_aggregates(df)
+    aggs = compute_aggregates(completed)
     aggs.to_csv(os.path.join(output_dir, "aggregates.csv"), index=False)
+    try:
+        aggs.to_parquet(os.path.join(output_dir, "aggregates.parquet"), index=False, compression="zstd")
+    except (ImportError, OSError) as e:
+        logger.info("aggregates.parquet not written (%s)", e)
 
     results = {"timestamp": datetime.now(timezone.utc).isoformat(), "gpu_available": GPU_AVAILABLE}
 
     if SKLEARN_AVAILABLE:
-        prepared, feature_cols, encoders = prepare_features(df)
+        prepared, feature_cols, encoders = prepare_features(completed)
+
+        # Train both models concurrently; they only read the shared feature
+        # frame and XGBoost releases the GIL while boosting. On CPU each
+        # booster gets half the cores so the two OpenMP teams don't
+        # oversubscribe the machine.
+        nthread = None if GPU_AVAILABLE else max(1, (os.cpu_count() or 1) // 2)
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            discharge_future = pool.submit(train_discharge_predictor, prepared, feature_cols, nthread)
+            recovery_future = pool.submit(train_extended_recovery_classifier, prepared, feature_cols, nthread)
+        discharge_result = discharge_future.result()
+        recovery_result = recovery_future.result()
 
-        # Train models
-        discharge_result = train_discharge_predictor(prepared, feature_cols)
         if discharge_result:
             results["discharge_predictor"] = discharge_result
-
-        recovery_result = train_extended_recovery_classifier(prepared, feature_cols)
         if recovery_result:
             results["extended_recovery_classifier"] = recovery_result
 
@@ -592,22 +915,22 @@ def run_analytics(input_path: str, output_dir: str):
         logger.warning("scikit-learn not available, skipping ML models")
 
     # Generate insights
-    insights = generate_insights(df, aggs)
+    insights = generate_insights(df, aggs, completed)
     results["insights"] = insights
 
     # Write results
     output_path = os.path.join(output_dir, "analytics_results.json")
-    with open(output_path, "w") as f:
-        json.dump(results, f, indent=2, default=str)
+    _write_json(results, output_path)
+    write_gzip_sibling(output_path)
     logger.info("Analytics results written to %s", output_path)
 
     # Generate HTML report
     try:
-        from src.analytics.report import build_report
-        report_html = build_report(results, aggs)
+        from src.analytics.report import write_report
         report_path = os.path.join(output_dir, "report.html")
-        with open(report_path, "w") as f:
-            f.write(report_html)
+        with atomic_open(report_path, "w", encoding="utf-8", buffering=1 << 20) as f:
+            write_report(results, aggs, f)
+        write_gzip_sibling(report_path)
         logger.info("HTML report written to %s", report_path)
     except Exception as e:
         logger.warning("Could not generate HTML report: %s", e)
@@ -619,14 +942,18 @@ def main():
     parser = argparse.ArgumentParser(description="Outpatient Flow Analytics")
     parser.add_argument(
         "--input", type=str, required=True,
-        help="Input CSV path or PostgreSQL connection string",
+        help="Input CSV or Parquet path, or PostgreSQL connection string",
     )
     parser.add_argument(
         "--output-dir", type=str, default="output/analytics",
         help="Output directory for results",
     )
+    parser.add_argument(
+        "--csv-cache-dir", type=str, default=None,
+        help="Keep a Parquet copy of CSV input here and reuse it while the CSV is unchanged",
+    )
     args = parser.parse_args()
-    run_analytics(args.input, args.output_dir)
+    run_analytics(args.input, args.output_dir, args.csv_cache_dir)
 
 
 if __name__ == "__main__":
@@ -1,7 +1,7 @@
 """
 Standalone HTML Report Generator for Outpatient Flow Analytics.
 
-Reads analytics_results.json + aggregates.csv and produces a single
+Reads analytics_results.json + aggregates (Parquet or CSV) and produces a single
 self-contained HTML file with KPI cards, Chart.js visualisations,
 facility comparisons, model metrics, and actionable insights.
 
@@ -12,80 +12,268 @@ Usage:
 """
 
 import argparse
+import csv
+import gzip
+import hashlib
 import json
 import html
 import logging
 import os
+import re
+import shutil
+from collections import Counter, defaultdict
+from contextlib import contextmanager
 from datetime import datetime, timezone
-from typing import Any, Dict, List
+from functools import lru_cache
+from operator import itemgetter
+from typing import IO, TYPE_CHECKING, Any, Dict, Iterator, List, Optional, TextIO
 
-import pandas as pd
+# pandas is imported where aggregates are loaded, so `--help` and argument
+# errors return without paying its import cost.
+if TYPE_CHECKING:
+    import pandas as pd
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
 logger = logging.getLogger(__name__)
 
+# Aggregate columns the report reads, with their types, declared up front so
+# readers load only these and skip type inference.
+AGG_DTYPES: Dict[str, str] = {
+    "facility_id": "str",
+    "procedure_type": "str",
+    "case_volume": "int32",
+    "dur_checkin_to_preop_mean": "float64",
+    "dur_preop_to_op_mean": "float64",
+    "dur_op_to_postop_mean": "float64",
+    "dur_postop_to_discharge_mean": "float64",
+    "dur_total_mean": "float64",
+    "dur_total_median": "float64",
+    "dur_total_p90": "float64",
+    "dur_total_std": "float64",
+    "late_start_rate": "float64",
+}
+
+
+@contextmanager
+def atomic_open(path: str, mode: str = "w", **kwargs) -> Iterator[IO]:
+    """Open a temp file next to ``path`` and move it over ``path`` on success.
+
+    Readers such as the report viewer only ever see the previous file or the
+    complete new one; a failure part-way removes the temp file instead.
+    """
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, mode, **kwargs) as f:
+            yield f
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def write_gzip_sibling(path: str):
+    """Write ``<path>.gz`` next to ``path`` so the report viewer can serve it precompressed."""
+    with open(path, "rb") as f:
+        data = gzip.compress(f.read(), compresslevel=9, mtime=0)
+    with atomic_open(path + ".gz", "wb") as f:
+        f.write(data)
+
+
+def _load_results(path: str) -> Dict[str, Any]:
+    """Load analytics_results.json, parsing with orjson when it is installed."""
+    with open(path, "rb") as f:
+        raw = f.read()
+    if orjson is not None:
+        try:
+            return orjson.loads(raw)
+        except orjson.JSONDecodeError:
+            pass  # e.g. bare NaN from the stdlib writer; let json handle it
+    return json.loads(raw)
+
+
+def _load_aggs(path: str) -> "pd.DataFrame":
+    """Load the report's aggregate columns, preferring the sibling Parquet file.
+
+    The analytics job writes ``aggregates.parquet`` next to ``aggregates.csv``;
+    it is used while at least as new as the CSV, reading only the needed
+    columns. Otherwise the CSV is parsed with the pyarrow engine when
+    available. Columns of AGG_DTYPES missing from the file (``late_start_rate``
+    without scheduled start times) are skipped rather than requested.
+    """
+    import pandas as pd
+
+    pq_path = os.path.splitext(path)[0] + ".parquet"
+    if os.path.exists(pq_path) and (
+        not os.path.exists(path) or os.path.getmtime(pq_path) >= os.path.getmtime(path)
+    ):
+        try:
+            import pyarrow.parquet as pq
+            names = set(pq.read_schema(pq_path).names)
+            return pd.read_parquet(pq_path, columns=[c for c in AGG_DTYPES if c in names])
+        except ImportError:
+            pass
+    with open(path, newline="", encoding="utf-8") as f:
+        header = set(next(csv.reader(f), []))
+    dtypes = {c: t for c, t in AGG_DTYPES.items() if c in header}
+    try:
+        return pd.read_csv(path, engine="pyarrow", usecols=list(dtypes), dtype=dtypes)
+    except ImportError:
+        return pd.read_csv(path, usecols=list(dtypes), dtype=dtypes)
+
+
 # ---------------------------------------------------------------------------
 # Chart.js helpers
 # ---------------------------------------------------------------------------
 
+def _dumps(obj: Any) -> str:
+    """Compact JSON for chart configs; orjson when installed, else the stdlib encoder."""
+    if orjson is not None:
+        return orjson.dumps(obj).decode()
+    return json.dumps(obj, separators=(",", ":"), ensure_ascii=False)
+
+
+@lru_cache(maxsize=None)
+def _bar_options(title: str, y_label: str, stacked: bool) -> str:
+    """Serialized Chart.js options for a bar chart, cached per title/axis combination."""
+    return _dumps({
+        "responsive": True,
+        "maintainAspectRatio": False,
+        "plugins": {
+            "title": {"display": True, "text": title, "color": "#c9d1d9",
+                      "font": {"size": 14, "weight": "500"}},
+            "legend": {"labels": {"color": "#8b949e", "font": {"size": 11}}}
+        },
+        "scales": {
+            "x": {"ticks": {"color": "#8b949e", "font": {"size": 10}},
+                   "grid": {"color": "#21262d"}},
+            "y": {"ticks": {"color": "#8b949e", "font": {"size": 10}},
+                   "grid": {"color": "#21262d"},
+                   "title": {"display": True, "text": y_label, "color": "#8b949e"},
+                   "stacked": stacked},
+        },
+    })
+
+
+@lru_cache(maxsize=None)
+def _doughnut_options(title: str) -> str:
+    """Serialized Chart.js options for a doughnut chart, cached per title."""
+    return _dumps({
+        "responsive": True, "maintainAspectRatio": False, "cutout": "65%",
+        "plugins": {
+            "title": {"display": True, "text": title, "color": "#c9d1d9",
+                      "font": {"size": 14, "weight": "500"}},
+            "legend": {"position": "bottom", "labels": {"color": "#c9d1d9",
+                       "padding": 16, "font": {"size": 11}}}
+        },
+    })
+
+
 def _bar_chart(canvas_id: str, labels: list, datasets: list, title: str,
                y_label: str = "Minutes", stacked: bool = False) -> str:
-    """Return a <script> block that renders a Chart.js bar chart."""
-    cfg = json.dumps({
-        "type": "bar",
-        "data": {"labels": labels, "datasets": datasets},
-        "options": {
-            "responsive": True,
-            "maintainAspectRatio": False,
-            "plugins": {
-                "title": {"display": True, "text": title, "color": "#c9d1d9",
-                          "font": {"size": 14, "weight": "500"}},
-                "legend": {"labels": {"color": "#8b949e", "font": {"size": 11}}}
-            },
-            "scales": {
-                "x": {"ticks": {"color": "#8b949e", "font": {"size": 10}},
-                       "grid": {"color": "#21262d"}},
-                "y": {"ticks": {"color": "#8b949e", "font": {"size": 10}},
-                       "grid": {"color": "#21262d"},
-                       "title": {"display": True, "text": y_label, "color": "#8b949e"},
-                       "stacked": stacked},
-            },
-        },
-    }, default=str)
+    """Return a <script> block that renders a Chart.js bar chart.
+
+    Only the data is encoded per call; the static options block comes from
+    the cached ``_bar_options``.
+    """
+    data = _dumps({"labels": labels, "datasets": datasets})
+    cfg = f'{{"type":"bar","data":{data},"options":{_bar_options(title, y_label, stacked)}}}'
     return f'<script>new Chart(document.getElementById("{canvas_id}"),{cfg});</script>'
 
 
 def _doughnut_chart(canvas_id: str, labels: list, values: list, colours: list, title: str) -> str:
-    cfg = json.dumps({
-        "type": "doughnut",
-        "data": {"labels": labels, "datasets": [{"data": values, "backgroundColor": colours,
-                                                   "borderWidth": 0, "hoverOffset": 6}]},
-        "options": {
-            "responsive": True, "maintainAspectRatio": False, "cutout": "65%",
-            "plugins": {
-                "title": {"display": True, "text": title, "color": "#c9d1d9",
-                          "font": {"size": 14, "weight": "500"}},
-                "legend": {"position": "bottom", "labels": {"color": "#c9d1d9",
-                           "padding": 16, "font": {"size": 11}}}
-            },
-        },
-    }, default=str)
+    data = _dumps({"labels": labels, "datasets": [{"data": values, "backgroundColor": colours,
+                                                         "borderWidth": 0, "hoverOffset": 6}]})
+    cfg = f'{{"type":"doughnut","data":{data},"options":{_doughnut_options(title)}}}'
     return f'<script>new Chart(document.getElementById("{canvas_id}"),{cfg});</script>'
 
 
+# ---------------------------------------------------------------------------
+# Escaping
+# ---------------------------------------------------------------------------
+
+# Facility names, procedure names, titles and tab labels repeat across cards
+# and table rows; cache their escapes.
+_esc = lru_cache(maxsize=1024)(html.escape)
+
+# severity -> (severity bar class, pill class, escaped pill label)
+_SEV_CLASSES = {
+    sev: (f"i-sev-{sev}", f"pill-{sev}", html.escape(label))
+    for sev, label in {"high": "High Priority", "medium": "Needs Review", "info": "Informational"}.items()
+}
+
+
 # ---------------------------------------------------------------------------
 # KPI card
 # ---------------------------------------------------------------------------
 
-def _kpi_card(label: str, value: str, sub: str = "", colour: str = "#58a6ff") -> str:
+def _kpi_card_raw(label: str, value: str, sub: str = "", colour: str = "#58a6ff") -> str:
+    """KPI card for trusted text (literals and formatted numbers); nothing is escaped."""
     return f"""
     <div class="kpi">
-      <div class="kpi-value" style="color:{colour}">{html.escape(str(value))}</div>
-      <div class="kpi-label">{html.escape(label)}</div>
-      <div class="kpi-sub">{html.escape(sub)}</div>
+      <div class="kpi-value" style="color:{colour}">{value}</div>
+      <div class="kpi-label">{label}</div>
+      <div class="kpi-sub">{sub}</div>
     </div>"""
 
 
+def _kpi_card(label: str, value: str, sub: str = "", colour: str = "#58a6ff") -> str:
+    return _kpi_card_raw(html.escape(label), html.escape(str(value)), html.escape(sub), colour)
+
+
+# ---------------------------------------------------------------------------
+# Insight card
+# ---------------------------------------------------------------------------
+
+_CARD_TMPL = (
+    '<div class="i-card">\n'
+    '<div class="i-head">'
+    '<div class="i-sev {sev_class}"></div>'
+    '<span class="pill {pill_class}">{sev_label}</span>'
+    '<span class="i-title">{title}</span>'
+    '<span class="i-facility">{fac}</span>'
+    '</div>\n'
+    '<div class="i-body">\n'
+    # What we found — always full width
+    '<div class="i-block i-block-full">'
+    '<div class="i-block-label">What we found</div>'
+    '{msg}</div>'
+    # Why it matters + What to do — side by side, each optional
+    '{impact}{action}\n'
+    '</div></div>'  # close i-body, i-card
+)
+_IMPACT_TMPL = ('\n<div class="i-block i-block-impact">'
+                '<div class="i-block-label">Why it matters</div>{}</div>')
+_ACTION_TMPL = ('\n<div class="i-block i-block-action">'
+                '<div class="i-block-label">Recommended actions</div>{}</div>')
+
+
+def _render_card(ins: Dict) -> str:
+    """Render one insight card as HTML."""
+    sev = ins.get("severity", "info")
+    sev_class, pill_class, sev_label = (_SEV_CLASSES.get(sev)
+                                        or (f"i-sev-{sev}", f"pill-{sev}", _esc(sev)))
+    impact = ins.get("impact", "")
+    action = ins.get("action", "")
+    return _CARD_TMPL.format(
+        sev_class=sev_class,
+        pill_class=pill_class,
+        sev_label=sev_label,
+        title=_esc(ins.get("title", ins.get("type", "").replace("_", " ").title())),
+        fac=_esc(ins.get("facility", "All")),
+        msg=html.escape(ins.get("message", "")),
+        impact=_IMPACT_TMPL.format(html.escape(impact)) if impact else "",
+        action=_ACTION_TMPL.format(html.escape(action)) if action else "",
+    )
+
+
 # ---------------------------------------------------------------------------
 # Report builder
 # ---------------------------------------------------------------------------
@@ -187,301 +375,388 @@ tr:hover td{background:rgba(88,166,255,0.03)}
         border-top:1px solid var(--border);letter-spacing:0.2px}
 """
 
+# Whitespace or a comment; runs of these collapse or vanish when minifying
+_CSS_GAP = r"(?:\s|/\*.*?\*/)"
+_CSS_TOKENS = re.compile(
+    r"""("(?:\\.|[^"\\])*"|'(?:\\.|[^'\\])*')"""  # quoted string, kept verbatim
+    rf"|{_CSS_GAP}*;{_CSS_GAP}*(}}){_CSS_GAP}*"       # redundant ";" before "}"
+    rf"|{_CSS_GAP}*([{{}}:;,>]){_CSS_GAP}*"           # punctuation, spacing dropped
+    rf"|{_CSS_GAP}+",                                 # anything else: one space
+    re.S,
+)
 
-def build_report(results: Dict[str, Any], aggs: pd.DataFrame) -> str:
-    """Build a complete self-contained HTML report string."""
+
+def _minify_css(css: str) -> str:
+    """Drop comments and cosmetic whitespace from REPORT_CSS.
+
+    Quoted strings (font names such as ``'Segoe UI'``, ``content:`` values)
+    pass through untouched. Whitespace around ``:``, ``,`` and ``>`` is always
+    removed, so selectors like ``a :hover`` that depend on it aren't supported.
+    """
+    return _CSS_TOKENS.sub(lambda m: m.group(1) or m.group(2) or m.group(3) or " ", css).strip()
+
+
+REPORT_CSS_MIN = _minify_css(REPORT_CSS)
+
+# Static document head, CSS included, built once at import. The Chart.js tag
+# (CDN or inlined), timestamp and backend tag vary and go in the fragments
+# between and after these.
+_HEAD_OPEN = """<!DOCTYPE html>
+<html lang="en">
+<head>
+<meta charset="utf-8"/>
+<meta name="viewport" content="width=device-width,initial-scale=1"/>
+<title>Outpatient Flow Analytics Report</title>"""
+
+CHARTJS_CDN_TAG = '<script src="https://cdn.jsdelivr.net/npm/chart.js@4/dist/chart.umd.min.js"></script>'
+
+
+def _inline_script(source: str) -> str:
+    """Wrap JS source in a <script> tag, escaping any closing tag it contains."""
+    escaped = re.sub(r"</(script)", r"<\\/\1", source, flags=re.IGNORECASE)
+    return "<script>" + escaped + "</script>"
+
+
+_HEAD_PREFIX = f"""<style>{REPORT_CSS_MIN}</style>
+</head>
+<body>
+
+<div class="header">
+  <h1>Outpatient Flow Analytics Report</h1>
+  <div class="sub">"""
+
+_HEAD_SUFFIX_FMT = """\
+    <span>Generated {ts} UTC</span>
+    <span class="tag {cls}">{txt}</span>
+  </div>
+</div>
+"""
+
+
+_ROW_TMPL = ('<tr><td>{fac}</td><td>{proc}</td><td class="num">{vol}</td>'
+             '<td class="num">{mean:.1f}</td><td class="num">{median:.1f}</td>'
+             '<td class="num">{p90:.1f}</td><td class="num">{std:.1f}</td>'
+             '<td class="num">{late}</td></tr>')
+
+
+_TAB_SWITCH_JS = """<script>
+document.querySelectorAll('input[name="itab"]').forEach(radio=>{
+  radio.addEventListener('change',()=>{
+    document.querySelectorAll('.tab-panel').forEach(p=>p.style.display='none');
+    const id=radio.id.replace('itab-','panel-');
+    const panel=document.getElementById(id);
+    if(panel)panel.style.display='block';
+  });
+});
+</script>"""
+
+_FOOTER_FMT = """
+<div class="footer">
+  Outpatient Flow Analytics &middot; OpenShift 4.21 &middot;
+  {total_cases:,} cases &middot; {n_combos} facility/procedure combinations &middot;
+  {backend} backend
+</div>
+"""
+
+TAB_ORDER = [
+    ("all", "All Findings"),
+    ("bottleneck", "Bottlenecks"),
+    ("high_variance", "Duration Variability"),
+    ("late_starts", "Late Starts"),
+    ("cross_facility", "Facility Comparisons"),
+    ("cancellation_rate", "Cancellations"),
+    ("facility_summary", "Facility Overviews"),
+]
+
+
+def _insight_fragments(insights: List[Dict], n_facilities: int) -> Iterator[str]:
+    """Yield the insights section: severity summary, tab bar, panels and tab JS."""
+    yield '<div class="insight-section">'
+    yield '<h2>Actionable Insights</h2>'
+    if not insights:
+        yield '<div class="insight-summary"><span>No findings for this run.</span></div>'
+        yield '</div>'
+        return
+
+    # Each card is rendered once and shared by the "all" panel and its type's panel.
+    cards = [_render_card(ins) for ins in insights]
+    grouped: Dict[str, List[str]] = defaultdict(list)
+    for ins, card in zip(insights, cards):
+        grouped[ins["type"]].append(card)
+    tabs = []
+    for tab_key, tab_label in TAB_ORDER:
+        tab_cards = cards if tab_key == "all" else grouped.get(tab_key)
+        if tab_cards or tab_key == "all":
+            tabs.append((tab_key, tab_label, tab_cards))
+    sev_counts = Counter(i.get("severity") for i in insights)
+    n_high = sev_counts["high"]
+    n_med = sev_counts["medium"]
+    n_info = sev_counts["info"]
+
+    yield '<div class="insight-summary">'
+    yield f'<span>{len(insights)} findings across {n_facilities} facilities</span>'
+    if n_high:
+        yield f'<span class="sev-badge"><span class="dot dot-high"></span>{n_high} high priority</span>'
+    if n_med:
+        yield f'<span class="sev-badge"><span class="dot dot-med"></span>{n_med} need review</span>'
+    if n_info:
+        yield f'<span class="sev-badge"><span class="dot dot-info"></span>{n_info} informational</span>'
+    yield '</div>'
+
+    # Tab bar
+    yield '<div class="tab-bar">'
+    for idx, (tab_key, tab_label, tab_cards) in enumerate(tabs):
+        count = len(tab_cards)
+        checked = ' checked' if idx == 0 else ''
+        yield f'<input class="tab-radio" type="radio" name="itab" id="itab-{tab_key}"{checked}/>'
+        yield (f'<label class="tab-label" for="itab-{tab_key}">'
+               f'{_esc(tab_label)}<span class="tab-count">{count}</span></label>')
+    yield '</div>'
+
+    # Tab panels — rendered as divs, toggled by JS (simpler than pure CSS sibling selectors for N tabs)
+    for tab_key, _, tab_cards in tabs:
+        display = "block" if tab_key == "all" else "none"
+        yield f'<div class="tab-panel" id="panel-{tab_key}" style="display:{display}">'
+        yield "\n".join(tab_cards)
+        yield '</div>'
+
+    # Tiny JS for tab switching (no external deps)
+    yield _TAB_SWITCH_JS
+
+    yield '</div>'  # close insight-section
+
+
+def _report_fragments(results: Dict[str, Any], aggs: "pd.DataFrame",
+                      chartjs: Optional[str]) -> Iterator[str]:
+    """Yield the report's HTML fragments; ``iter_report`` puts newlines between them."""
 
     ts = results.get("timestamp", datetime.now(timezone.utc).isoformat())
     gpu = results.get("gpu_available", False)
     insights: List[Dict] = results.get("insights", [])
 
-    facility_summaries = [i for i in insights if i["type"] == "facility_summary"]
-    total_cases = sum(i["total_cases"] for i in facility_summaries)
-    avg_total = sum(i["avg_total_minutes"] * i["total_cases"] for i in facility_summaries) / max(total_cases, 1)
-    cancel = next((i for i in insights if i["type"] == "cancellation_rate"), None)
+    # One pass picks out the facility summaries and the first cancellation-rate insight.
+    facility_summaries = []
+    cancel = None
+    for i in insights:
+        kind = i["type"]
+        if kind == "facility_summary":
+            facility_summaries.append(i)
+        elif kind == "cancellation_rate" and cancel is None:
+            cancel = i
+    fac_labels, fac_volumes, fac_avg = [], [], []
+    total_cases = 0
+    weighted_minutes = 0.0
+    for i in facility_summaries:
+        tc = int(i["total_cases"])
+        total_cases += tc
+        weighted_minutes += i["avg_total_minutes"] * tc
+        fac_labels.append(str(i["facility"]))
+        fac_volumes.append(tc)
+        fac_avg.append(round(float(i["avg_total_minutes"]), 1))
+    avg_total = weighted_minutes / max(total_cases, 1)
     cancel_rate = f"{cancel['rate']:.1%}" if cancel else "N/A"
-    cancel_count = cancel["count"] if cancel else 0
+    cancel_count = int(cancel["count"]) if cancel else 0
     n_facilities = len(facility_summaries)
 
     dp = results.get("discharge_predictor", {})
     rc = results.get("extended_recovery_classifier", {})
 
-    fac_labels = [i["facility"] for i in facility_summaries]
-    fac_volumes = [i["total_cases"] for i in facility_summaries]
-    fac_avg = [round(i["avg_total_minutes"], 1) for i in facility_summaries]
     fac_colours = ["#58a6ff", "#a78bfa", "#3fb950"]
 
-    top_procs = aggs.nlargest(10, "case_volume")
-    proc_labels = [f"{r['procedure_type']} ({r['facility_id']})" for _, r in top_procs.iterrows()]
-    proc_means = [round(r["dur_total_mean"], 1) for _, r in top_procs.iterrows()]
-    proc_p90 = [round(r["dur_total_p90"], 1) for _, r in top_procs.iterrows()]
+    # One partial sort serves both the top-10 chart and the top-20 table.
+    top20 = aggs.nlargest(20, "case_volume")
+    top_procs = top20.head(10)
+    # Chart inputs are plain str/int/float so the JSON encoder needs no default hook.
+    proc_labels = [f"{proc} ({fac})" for proc, fac in
+                   zip(top_procs["procedure_type"].tolist(), top_procs["facility_id"].tolist())]
+    proc_means = [round(v, 1) for v in top_procs["dur_total_mean"].tolist()]
+    proc_p90 = [round(v, 1) for v in top_procs["dur_total_p90"].tolist()]
 
     phase_cols = ["dur_checkin_to_preop_mean", "dur_preop_to_op_mean",
                   "dur_op_to_postop_mean", "dur_postop_to_discharge_mean"]
     phase_nice = ["Check-in to Pre-op", "Pre-op to OR", "OR to PACU", "PACU to Discharge"]
     phase_colors = ["#58a6ff", "#a78bfa", "#f0883e", "#3fb950"]
-    phase_datasets = []
-    for col, nice, clr in zip(phase_cols, phase_nice, phase_colors):
-        vals = []
-        for fac in fac_labels:
-            fac_rows = aggs[aggs["facility_id"] == fac]
-            vals.append(round(fac_rows[col].mean(), 1))
-        phase_datasets.append({"label": nice, "data": vals, "backgroundColor": clr})
+    # One grouped pass over aggs; reindex keeps facilities missing from aggs as NaN.
+    phase_means = (aggs.groupby("facility_id", observed=True, sort=False)[phase_cols]
+                   .mean().reindex(fac_labels))
+    phase_datasets = [
+        {"label": nice, "data": [round(v, 1) for v in phase_means[col].tolist()], "backgroundColor": clr}
+        for col, nice, clr in zip(phase_cols, phase_nice, phase_colors)
+    ]
 
     fi = dp.get("feature_importance", {})
-    fi_sorted = sorted(fi.items(), key=lambda x: x[1], reverse=True)
+    fi_sorted = sorted(fi.items(), key=itemgetter(1), reverse=True)
     fi_labels = [k.replace("_enc", "").replace("dur_", "").replace("_", " ").title() for k, _ in fi_sorted]
-    fi_values = [round(v * 100, 1) for _, v in fi_sorted]
+    fi_values = [round(float(v) * 100, 1) for _, v in fi_sorted]
 
     completed = total_cases
     canceled = cancel_count
     other = (cancel["total"] - completed - canceled) if cancel else 0
 
     charts_js = []
-    parts = []
 
     tag_class = "tag-gpu" if gpu else "tag-cpu"
     tag_text = "GPU — RAPIDS" if gpu else "CPU"
 
-    parts.append(f"""<!DOCTYPE html>
-<html lang="en">
-<head>
-<meta charset="utf-8"/>
-<meta name="viewport" content="width=device-width,initial-scale=1"/>
-<title>Outpatient Flow Analytics Report</title>
-<script src="https://cdn.jsdelivr.net/npm/chart.js@4/dist/chart.umd.min.js"></script>
-<style>{REPORT_CSS}</style>
-</head>
-<body>
-
-<div class="header">
-  <h1>Outpatient Flow Analytics Report</h1>
-  <div class="sub">
-    <span>Generated {html.escape(ts[:19].replace("T"," "))} UTC</span>
-    <span class="tag {tag_class}">{tag_text}</span>
-  </div>
-</div>
-""")
+    yield _HEAD_OPEN
+    yield CHARTJS_CDN_TAG if chartjs is None else _inline_script(chartjs)
+    yield _HEAD_PREFIX
+    yield _HEAD_SUFFIX_FMT.format(ts=html.escape(ts[:19].replace("T", " ")), cls=tag_class, txt=tag_text)
 
-    # KPIs
-    parts.append('<div class="kpi-row">')
-    parts.append(_kpi_card("Total Completed Cases", f"{total_cases:,}", f"across {n_facilities} facilities"))
-    parts.append(_kpi_card("Avg Total Duration", f"{avg_total:.0f} min", "check-in to discharge", "#a78bfa"))
-    parts.append(_kpi_card("Cancellation Rate", cancel_rate, f"{cancel_count} cancelled", "#f85149"))
+    # KPIs — every value is a literal or a formatted number, so nothing needs escaping
+    yield '<div class="kpi-row">'
+    yield _kpi_card_raw("Total Completed Cases", f"{total_cases:,}", f"across {n_facilities} facilities")
+    yield _kpi_card_raw("Avg Total Duration", f"{avg_total:.0f} min", "check-in to discharge", "#a78bfa")
+    yield _kpi_card_raw("Cancellation Rate", cancel_rate, f"{cancel_count} cancelled", "#f85149")
     if dp:
-        parts.append(_kpi_card("Discharge Prediction", f"R\u00b2 {dp.get('r2_score', 0):.2f}",
-                                f"MAE {dp.get('mae_minutes', 0):.1f} min", "#3fb950"))
+        yield _kpi_card_raw("Discharge Prediction", f"R\u00b2 {dp.get('r2_score', 0):.2f}",
+                             f"MAE {dp.get('mae_minutes', 0):.1f} min", "#3fb950")
     if rc:
-        parts.append(_kpi_card("Recovery Risk Model", f"AUC {rc.get('auc_score', 0):.2f}",
-                                f"p90 threshold {rc.get('p90_threshold_minutes', 0):.0f} min", "#f0883e"))
-    parts.append('</div>')
+        yield _kpi_card_raw("Recovery Risk Model", f"AUC {rc.get('auc_score', 0):.2f}",
+                             f"p90 threshold {rc.get('p90_threshold_minutes', 0):.0f} min", "#f0883e")
+    yield '</div>'
 
     # Charts
-    parts.append('<div class="section"><h2>Facility and Procedure Analytics</h2><div class="chart-grid">')
+    yield '<div class="section"><h2>Facility and Procedure Analytics</h2><div class="chart-grid">'
 
-    parts.append('<div class="chart-card"><div class="chart-wrap"><canvas id="c1"></canvas></div></div>')
+    yield '<div class="chart-card"><div class="chart-wrap"><canvas id="c1"></canvas></div></div>'
     charts_js.append(_bar_chart("c1", fac_labels,
         [{"label": "Cases", "data": fac_volumes, "backgroundColor": fac_colours}],
         "Case Volume by Facility", "Cases"))
 
-    parts.append('<div class="chart-card"><div class="chart-wrap"><canvas id="c2"></canvas></div></div>')
+    yield '<div class="chart-card"><div class="chart-wrap"><canvas id="c2"></canvas></div></div>'
     charts_js.append(_bar_chart("c2", fac_labels,
         [{"label": "Avg Total (min)", "data": fac_avg, "backgroundColor": fac_colours}],
         "Average Total Duration by Facility"))
 
-    parts.append('<div class="chart-card"><div class="chart-wrap"><canvas id="c3"></canvas></div></div>')
+    yield '<div class="chart-card"><div class="chart-wrap"><canvas id="c3"></canvas></div></div>'
     charts_js.append(_bar_chart("c3", fac_labels, phase_datasets,
         "Duration Phase Breakdown by Facility", stacked=True))
 
-    parts.append('<div class="chart-card"><div class="chart-wrap"><canvas id="c4"></canvas></div></div>')
+    yield '<div class="chart-card"><div class="chart-wrap"><canvas id="c4"></canvas></div></div>'
     charts_js.append(_bar_chart("c4", proc_labels,
         [{"label": "Mean", "data": proc_means, "backgroundColor": "#58a6ff"},
          {"label": "p90", "data": proc_p90, "backgroundColor": "rgba(240,136,62,0.5)"}],
         "Top 10 Procedures — Mean vs p90 Duration"))
 
-    parts.append('<div class="chart-card"><div class="chart-wrap"><canvas id="c5"></canvas></div></div>')
+    yield '<div class="chart-card"><div class="chart-wrap"><canvas id="c5"></canvas></div></div>'
     charts_js.append(_doughnut_chart("c5",
         ["Completed", "Cancelled", "Other"],
-        [completed, canceled, max(other, 0)],
+        [int(completed), int(canceled), int(max(other, 0))],
         ["#3fb950", "#f85149", "#30363d"],
         "Case Status Distribution"))
 
     if fi_labels:
-        parts.append('<div class="chart-card"><div class="chart-wrap"><canvas id="c6"></canvas></div></div>')
+        yield '<div class="chart-card"><div class="chart-wrap"><canvas id="c6"></canvas></div></div>'
         charts_js.append(_bar_chart("c6", fi_labels,
             [{"label": "Importance %", "data": fi_values, "backgroundColor": "#a78bfa"}],
             "Discharge Model — Feature Importance", "Importance %"))
 
-    parts.append('</div></div>')
+    yield '</div></div>'
 
     # ML Model cards
-    parts.append('<div class="section"><h2>Machine Learning Models</h2><div class="model-grid">')
+    yield '<div class="section"><h2>Machine Learning Models</h2><div class="model-grid">'
     if dp:
         accel = "GPU (RAPIDS + XGBoost)" if dp.get("gpu_used") else "CPU"
-        parts.append(f"""
+        yield f"""
         <div class="model-card">
           <h3>Discharge Time Predictor</h3>
           <div class="metric-row"><span class="metric-label">Algorithm</span><span class="metric-value">{dp["model_type"]}</span></div>
           <div class="metric-row"><span class="metric-label">Mean Absolute Error</span><span class="metric-value">{dp["mae_minutes"]} min</span></div>
           <div class="metric-row"><span class="metric-label">R\u00b2 Score</span><span class="metric-value">{dp["r2_score"]}</span></div>
-          <div class="metric-row"><span class="metric-label">Training / Test Split</span><span class="metric-value">{dp["n_train"]:,} / {dp["n_test"]:,}</span></div>
+          <div class="metric-row"><span class="metric-label">Train / Validation / Test</span><span class="metric-value">{dp["n_train"]:,} / {dp.get("n_val", 0):,} / {dp["n_test"]:,}</span></div>
           <div class="metric-row"><span class="metric-label">Compute Backend</span><span class="metric-value">{accel}</span></div>
-        </div>""")
+        </div>"""
     if rc:
         accel = "GPU (RAPIDS + XGBoost)" if rc.get("gpu_used") else "CPU"
-        parts.append(f"""
+        yield f"""
         <div class="model-card">
           <h3>Extended Recovery Risk Classifier</h3>
           <div class="metric-row"><span class="metric-label">Algorithm</span><span class="metric-value">{rc["model_type"]}</span></div>
           <div class="metric-row"><span class="metric-label">AUC Score</span><span class="metric-value">{rc["auc_score"]}</span></div>
           <div class="metric-row"><span class="metric-label">p90 Threshold</span><span class="metric-value">{rc["p90_threshold_minutes"]} min</span></div>
-          <div class="metric-row"><span class="metric-label">Training / Test Split</span><span class="metric-value">{rc["n_train"]:,} / {rc["n_test"]:,}</span></div>
+          <div class="metric-row"><span class="metric-label">Train / Validation / Test</span><span class="metric-value">{rc["n_train"]:,} / {rc.get("n_val", 0):,} / {rc["n_test"]:,}</span></div>
           <div class="metric-row"><span class="metric-label">Compute Backend</span><span class="metric-value">{accel}</span></div>
-        </div>""")
-    parts.append('</div></div>')
+        </div>"""
+    yield '</div></div>'
 
     # ---------- Actionable Insights — tabbed interface ----------
-    TAB_ORDER = [
-        ("all", "All Findings"),
-        ("bottleneck", "Bottlenecks"),
-        ("high_variance", "Duration Variability"),
-        ("late_starts", "Late Starts"),
-        ("cross_facility", "Facility Comparisons"),
-        ("cancellation_rate", "Cancellations"),
-        ("facility_summary", "Facility Overviews"),
-    ]
+    yield from _insight_fragments(insights, n_facilities)
 
-    grouped: Dict[str, list] = {}
-    for ins in insights:
-        grouped.setdefault(ins["type"], []).append(ins)
-    n_high = sum(1 for i in insights if i.get("severity") == "high")
-    n_med = sum(1 for i in insights if i.get("severity") == "medium")
-    n_info = sum(1 for i in insights if i.get("severity") == "info")
-
-    parts.append('<div class="insight-section">')
-    parts.append('<h2>Actionable Insights</h2>')
-    parts.append('<div class="insight-summary">')
-    parts.append(f'<span>{len(insights)} findings across {n_facilities} facilities</span>')
-    if n_high:
-        parts.append(f'<span class="sev-badge"><span class="dot dot-high"></span>{n_high} high priority</span>')
-    if n_med:
-        parts.append(f'<span class="sev-badge"><span class="dot dot-med"></span>{n_med} need review</span>')
-    if n_info:
-        parts.append(f'<span class="sev-badge"><span class="dot dot-info"></span>{n_info} informational</span>')
-    parts.append('</div>')
+    # Top procedures table
+    yield '<div class="section"><h2>Top 20 Procedures by Volume</h2><table>'
+    yield ('<tr><th>Facility</th><th>Procedure</th><th class="num">Volume</th>'
+           '<th class="num">Mean</th><th class="num">Median</th>'
+           '<th class="num">p90</th><th class="num">\u03c3</th><th class="num">Late Start</th></tr>')
+    if "late_start_rate" not in top20:
+        top20 = top20.assign(late_start_rate=float("nan"))
+    table_cols = ["facility_id", "procedure_type", "case_volume", "dur_total_mean",
+                  "dur_total_median", "dur_total_p90", "dur_total_std", "late_start_rate"]
+    has_late = top20["late_start_rate"].notna().to_numpy()
+    rows = "\n".join([
+        _ROW_TMPL.format(fac=_esc(str(fac)), proc=_esc(str(proc)), vol=int(vol),
+                         mean=mean, median=median, p90=p90, std=std,
+                         late=f"{late:.0%}" if ok else "\u2014")
+        for (fac, proc, vol, mean, median, p90, std, late), ok
+        in zip(top20[table_cols].itertuples(index=False, name=None), has_late)
+    ])
+    if rows:
+        yield rows
+    yield '</table></div>'
 
-    # Tab bar
-    parts.append('<div class="tab-bar">')
-    for idx, (tab_key, tab_label) in enumerate(TAB_ORDER):
-        count = len(insights) if tab_key == "all" else len(grouped.get(tab_key, []))
-        if count == 0 and tab_key != "all":
-            continue
-        checked = ' checked' if idx == 0 else ''
-        parts.append(f'<input class="tab-radio" type="radio" name="itab" id="itab-{tab_key}"{checked}/>')
-        parts.append(f'<label class="tab-label" for="itab-{tab_key}">'
-                     f'{html.escape(tab_label)}<span class="tab-count">{count}</span></label>')
-    parts.append('</div>')
+    # Footer
+    yield _FOOTER_FMT.format(total_cases=total_cases, n_combos=len(aggs),
+                             backend="GPU (RAPIDS)" if gpu else "CPU")
 
-    # Tab panels — rendered as divs, toggled by JS (simpler than pure CSS sibling selectors for N tabs)
-    def _render_cards(items: List[Dict]) -> str:
-        """Render a list of insight cards as HTML."""
-        out = []
-        for ins in items:
-            sev = ins.get("severity", "info")
-            fac = ins.get("facility", "All")
-            title = ins.get("title", ins.get("type", "").replace("_", " ").title())
-            msg = ins.get("message", "")
-            impact = ins.get("impact", "")
-            action = ins.get("action", "")
-            sev_label = {"high": "High Priority", "medium": "Needs Review", "info": "Informational"}.get(sev, sev)
-
-            out.append(f'<div class="i-card">')
-            out.append(f'<div class="i-head">'
-                       f'<div class="i-sev i-sev-{sev}"></div>'
-                       f'<span class="pill pill-{sev}">{html.escape(sev_label)}</span>'
-                       f'<span class="i-title">{html.escape(title)}</span>'
-                       f'<span class="i-facility">{html.escape(fac)}</span>'
-                       f'</div>')
-            out.append('<div class="i-body">')
-
-            # What we found — always full width
-            out.append(f'<div class="i-block i-block-full">'
-                       f'<div class="i-block-label">What we found</div>'
-                       f'{html.escape(msg)}</div>')
-
-            # Why it matters + What to do — side by side
-            if impact:
-                out.append(f'<div class="i-block i-block-impact">'
-                           f'<div class="i-block-label">Why it matters</div>'
-                           f'{html.escape(impact)}</div>')
-            if action:
-                out.append(f'<div class="i-block i-block-action">'
-                           f'<div class="i-block-label">Recommended actions</div>'
-                           f'{html.escape(action)}</div>')
-
-            out.append('</div></div>')  # close i-body, i-card
-        return "\n".join(out)
-
-    for tab_key, _ in TAB_ORDER:
-        items = insights if tab_key == "all" else grouped.get(tab_key, [])
-        if not items and tab_key != "all":
-            continue
-        display = "block" if tab_key == "all" else "none"
-        parts.append(f'<div class="tab-panel" id="panel-{tab_key}" style="display:{display}">')
-        parts.append(_render_cards(items))
-        parts.append('</div>')
+    yield "\n".join(charts_js)
+    yield "</body></html>"
 
-    # Tiny JS for tab switching (no external deps)
-    parts.append("""<script>
-document.querySelectorAll('input[name="itab"]').forEach(radio=>{
-  radio.addEventListener('change',()=>{
-    document.querySelectorAll('.tab-panel').forEach(p=>p.style.display='none');
-    const id=radio.id.replace('itab-','panel-');
-    const panel=document.getElementById(id);
-    if(panel)panel.style.display='block';
-  });
-});
-</script>""")
 
-    parts.append('</div>')  # close insight-section
+def iter_report(results: Dict[str, Any], aggs: "pd.DataFrame",
+                chartjs: Optional[str] = None) -> Iterator[str]:
+    """Yield the self-contained HTML report in chunks, in document order."""
+    fragments = _report_fragments(results, aggs, chartjs)
+    yield next(fragments)
+    for fragment in fragments:
+        yield "\n"
+        yield fragment
 
-    # Top procedures table
-    parts.append('<div class="section"><h2>Top 20 Procedures by Volume</h2><table>')
-    parts.append('<tr><th>Facility</th><th>Procedure</th><th class="num">Volume</th>'
-                 '<th class="num">Mean</th><th class="num">Median</th>'
-                 '<th class="num">p90</th><th class="num">\u03c3</th><th class="num">Late Start</th></tr>')
-    for _, r in aggs.nlargest(20, "case_volume").iterrows():
-        late_pct = f"{r.get('late_start_rate', 0):.0%}" if pd.notna(r.get("late_start_rate")) else "\u2014"
-        parts.append(
-            f'<tr><td>{html.escape(str(r["facility_id"]))}</td>'
-            f'<td>{html.escape(str(r["procedure_type"]))}</td>'
-            f'<td class="num">{int(r["case_volume"])}</td>'
-            f'<td class="num">{r["dur_total_mean"]:.1f}</td>'
-            f'<td class="num">{r["dur_total_median"]:.1f}</td>'
-            f'<td class="num">{r["dur_total_p90"]:.1f}</td>'
-            f'<td class="num">{r["dur_total_std"]:.1f}</td>'
-            f'<td class="num">{late_pct}</td></tr>')
-    parts.append('</table></div>')
 
-    # Footer
-    parts.append(f"""
-<div class="footer">
-  Outpatient Flow Analytics &middot; OpenShift 4.21 &middot;
-  {total_cases:,} cases &middot; {len(aggs)} facility/procedure combinations &middot;
-  {"GPU (RAPIDS)" if gpu else "CPU"} backend
-</div>
-""")
+def write_report(results: Dict[str, Any], aggs: "pd.DataFrame", out: TextIO,
+                 chartjs: Optional[str] = None) -> int:
+    """Stream the report into the text file ``out``; returns the characters written."""
+    written = 0
+    for chunk in iter_report(results, aggs, chartjs):
+        written += out.write(chunk)
+    return written
 
-    parts.append("\n".join(charts_js))
-    parts.append("</body></html>")
 
-    return "\n".join(parts)
+def build_report(results: Dict[str, Any], aggs: "pd.DataFrame", chartjs: Optional[str] = None) -> str:
+    """Build a complete self-contained HTML report string."""
+    return "".join(iter_report(results, aggs, chartjs))
 
 
 # ---------------------------------------------------------------------------
 # CLI
 # ---------------------------------------------------------------------------
 
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "outpatient-report")
+
+
+def _render_cache_key(*paths: str) -> str:
+    """Hash the path, mtime and size of each input; missing files hash as absent."""
+    parts = []
+    for path in paths:
+        path = os.path.abspath(path)
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            parts.append(f"{path}:-")
+        else:
+            parts.append(f"{path}:{st.st_mtime_ns}:{st.st_size}")
+    return hashlib.blake2b("|".join(parts).encode(), digest_size=16).hexdigest()
+
+
 def main():
     parser = argparse.ArgumentParser(description="Generate HTML analytics report")
     parser.add_argument("--results", type=str, default="output/analytics/analytics_results.json",
@@ -490,18 +765,59 @@ def main():
                         help="Path to aggregates.csv")
     parser.add_argument("--output", type=str, default="output/analytics/report.html",
                         help="Output HTML file path")
+    parser.add_argument("--gzip", action="store_true",
+                        help="Also write a gzip-compressed <output>.gz next to the HTML")
+    parser.add_argument("--chartjs", type=str, default=None,
+                        help="Local chart.umd.min.js to inline instead of loading Chart.js from the CDN")
+    parser.add_argument("--cache-dir", type=str, default=DEFAULT_CACHE_DIR,
+                        help="Directory of rendered reports keyed by input files")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="Always re-render, bypassing the report cache")
     args = parser.parse_args()
 
-    with open(args.results) as f:
-        results = json.load(f)
-    aggs = pd.read_csv(args.aggregates)
-
-    report_html = build_report(results, aggs)
-
     os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
-    with open(args.output, "w") as f:
-        f.write(report_html)
-    logger.info("Report written to %s (%d KB)", args.output, len(report_html) // 1024)
+    out_path = args.output
+    cache_path = None
+    if not args.no_cache:
+        inputs = [args.results, args.aggregates, os.path.splitext(args.aggregates)[0] + ".parquet", __file__]
+        if args.chartjs:
+            inputs.append(args.chartjs)
+        key = _render_cache_key(*inputs)
+        cache_path = os.path.join(args.cache_dir, key + ".html")
+        if os.path.exists(cache_path):
+            with open(cache_path, "rb") as src, atomic_open(out_path, "wb") as dst:
+                shutil.copyfileobj(src, dst)
+            logger.info("Report copied to %s from cache %s", out_path, cache_path)
+            if args.gzip:
+                write_gzip_sibling(out_path)
+            return
+
+    results = _load_results(args.results)
+    aggs = _load_aggs(args.aggregates)
+    chartjs = None
+    if args.chartjs:
+        with open(args.chartjs, encoding="utf-8") as f:
+            chartjs = f.read()
+
+    # Rendered into a temp file and renamed, so a failure part-way never
+    # leaves a truncated report where the viewer would list it.
+    with atomic_open(out_path, "w", encoding="utf-8", buffering=1 << 20) as f:
+        written = write_report(results, aggs, f, chartjs)
+    logger.info("Report written to %s (%d KB)", out_path, written // 1024)
+    if args.gzip:
+        # Plain HTML stays in place: the viewer lists .html files and serves a
+        # fresh .gz sibling to clients that accept gzip.
+        write_gzip_sibling(out_path)
+        logger.info("Compressed copy %s.gz (%d KB)", out_path, os.path.getsize(out_path + ".gz") // 1024)
+
+    if cache_path is not None:
+        try:
+            os.makedirs(args.cache_dir, exist_ok=True)
+            tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+            shutil.copyfile(out_path, tmp_path)
+            os.replace(tmp_path, cache_path)
+        except OSError as e:
+            logger.info("Report cache not written (%s)", e)
 
 
 if __name__ == "__main__":
@@ -8,11 +8,17 @@ Designed to run as a Kubernetes CronJob every 4 hours.
 """
 
 import argparse
+import io
 import logging
 import os
+import queue
 import sys
+import tempfile
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone
+from operator import itemgetter
 from typing import Optional
 
 try:
@@ -31,6 +37,7 @@ TRANSFER_COLUMNS = [
     "postop_start_time", "discharge_time", "anesthesia_type",
     "asa_class", "case_status", "created_at", "source_generator_id",
 ]
+_row_values = itemgetter(*TRANSFER_COLUMNS)
 
 
 def get_connection(host: str, port: int, dbname: str, user: str, password: str):
@@ -71,6 +78,13 @@ def update_watermark(central_conn, source_id: str, last_created_at: datetime, ro
         )
 
 
+def edge_max_created(edge_conn) -> Optional[datetime]:
+    """Newest created_at on the edge DB (an index probe on created_at)."""
+    with edge_conn.cursor() as cur:
+        cur.execute("SELECT MAX(created_at) FROM outpatient_case_event")
+        return cur.fetchone()[0]
+
+
 def fetch_new_rows(edge_conn, watermark: Optional[datetime], batch_size: int = 10000):
     """Fetch rows from edge DB newer than watermark."""
     cols = ", ".join(TRANSFER_COLUMNS)
@@ -78,12 +92,12 @@ def fetch_new_rows(edge_conn, watermark: Optional[datetime], batch_size: int = 1
         if watermark:
             cur.execute(
                 f"SELECT {cols} FROM outpatient_case_event "
-                f"WHERE created_at > %s ORDER BY created_at ASC",
+                f"WHERE created_at > %s ORDER BY created_at, event_id",
                 (watermark,),
             )
         else:
             cur.execute(
-                f"SELECT {cols} FROM outpatient_case_event ORDER BY created_at ASC"
+                f"SELECT {cols} FROM outpatient_case_event ORDER BY created_at, event_id"
             )
         while True:
             rows = cur.fetchmany(batch_size)
@@ -92,23 +106,143 @@ def fetch_new_rows(edge_conn, watermark: Optional[datetime], batch_size: int = 1
             yield rows
 
 
-def insert_rows(central_conn, rows):
-    """Insert rows into central DB idempotently."""
+_DONE = object()
+
+
+def prefetch(iterable, depth: int = 2):
+    """Yield from ``iterable`` while a worker thread fetches up to ``depth`` items ahead.
+
+    Lets the edge fetch overlap the central load; exceptions raised by the
+    producer are re-raised in the consumer once the queue is drained.
+    """
+    q = queue.Queue(maxsize=depth)
+    stop = threading.Event()
+
+    def produce():
+        try:
+            for item in iterable:
+                q.put(item)
+                if stop.is_set():
+                    break
+        finally:
+            q.put(_DONE)
+
+    with ThreadPoolExecutor(max_workers=1, thread_name_prefix="etl-fetch") as pool:
+        future = pool.submit(produce)
+        try:
+            while (item := q.get()) is not _DONE:
+                yield item
+        finally:
+            stop.set()
+            while not future.done():
+                try:
+                    q.get(timeout=0.1)
+                except queue.Empty:
+                    pass
+        future.result()
+
+
+def insert_rows(central_conn, rows, page_size: int = 1000):
+    """Insert rows into central DB idempotently.
+
+    Rows go out as multi-row ``INSERT ... VALUES`` statements of
+    ``page_size`` rows each. ``RETURNING`` reports the rows actually inserted
+    across all pages, so conflicts are not counted.
+    """
     if not rows:
         return 0
     cols = ", ".join(TRANSFER_COLUMNS)
-    placeholders = ", ".join(["%s"] * len(TRANSFER_COLUMNS))
     query = (
-        f"INSERT INTO outpatient_case_event ({cols}) VALUES ({placeholders}) "
-        f"ON CONFLICT (event_id) DO NOTHING"
+        f"INSERT INTO outpatient_case_event ({cols}) VALUES %s "
+        f"ON CONFLICT (event_id) DO NOTHING RETURNING 1"
     )
-    count = 0
+    values = [_row_values(row) for row in rows]
     with central_conn.cursor() as cur:
-        for row in rows:
-            values = [row[col] for col in TRANSFER_COLUMNS]
-            cur.execute(query, values)
-            count += cur.rowcount
-    return count
+        inserted = psycopg2.extras.execute_values(cur, query, values, page_size=page_size, fetch=True)
+    return len(inserted)
+
+
+# Session-local staging table for COPY loads. TEMP tables skip WAL, and
+# ON COMMIT DELETE ROWS empties it at every commit.
+STAGE_TABLE = "stage_case_event"
+
+
+def _copy_field(value) -> str:
+    """Render one value in PostgreSQL COPY text format."""
+    if value is None:
+        return "\\N"
+    text = value.isoformat() if isinstance(value, datetime) else str(value)
+    return (text.replace("\\", "\\\\").replace("\t", "\\t")
+            .replace("\n", "\\n").replace("\r", "\\r"))
+
+
+def copy_rows(central_conn, rows):
+    """Bulk-load rows into central DB via COPY into a staging table.
+
+    The batch is COPYed into a TEMP staging table, then merged with
+    ``INSERT ... SELECT ... ON CONFLICT DO NOTHING``, which keeps the load
+    idempotent.
+    """
+    if not rows:
+        return 0
+    buf = io.StringIO()
+    for row in rows:
+        buf.write("\t".join(map(_copy_field, _row_values(row))))
+        buf.write("\n")
+    buf.seek(0)
+
+    cols = ", ".join(TRANSFER_COLUMNS)
+    with central_conn.cursor() as cur:
+        _ensure_stage_table(cur)
+        cur.copy_expert(f"COPY {STAGE_TABLE} ({cols}) FROM STDIN WITH (FORMAT text)", buf)
+        cur.execute(
+            f"INSERT INTO outpatient_case_event ({cols}) "
+            f"SELECT {cols} FROM {STAGE_TABLE} ON CONFLICT (event_id) DO NOTHING"
+        )
+        return cur.rowcount
+
+
+def _ensure_stage_table(cur):
+    cur.execute(
+        f"CREATE TEMP TABLE IF NOT EXISTS {STAGE_TABLE} "
+        f"(LIKE outpatient_case_event INCLUDING DEFAULTS) ON COMMIT DELETE ROWS"
+    )
+    cur.execute(f"TRUNCATE {STAGE_TABLE}")
+
+
+def transfer_binary(edge_conn, central_conn, watermark: Optional[datetime],
+                    spool_bytes: int = 64 * 1024 * 1024):
+    """Pipe new rows edge -> central as binary COPY, never building Python rows.
+
+    Edge rows newer than the watermark are COPYed out in binary format into
+    a spooled temp file (in memory up to ``spool_bytes``, then on disk). They
+    are COPYed into the central staging table and merged idempotently.
+    Returns ``(rows inserted, max created_at)``; the max is ``None`` when
+    nothing was staged.
+    """
+    cols = ", ".join(TRANSFER_COLUMNS)
+    select = f"SELECT {cols} FROM outpatient_case_event"
+    with tempfile.SpooledTemporaryFile(max_size=spool_bytes) as spool:
+        with edge_conn.cursor() as cur:
+            if watermark:
+                select = cur.mogrify(select + " WHERE created_at > %s", (watermark,)).decode()
+            cur.copy_expert(f"COPY ({select} ORDER BY created_at, event_id) TO STDOUT WITH (FORMAT binary)", spool)
+        spool.seek(0)
+
+        with central_conn.cursor() as cur:
+            _ensure_stage_table(cur)
+            cur.copy_expert(f"COPY {STAGE_TABLE} ({cols}) FROM STDIN WITH (FORMAT binary)", spool)
+            cur.execute(f"SELECT MAX(created_at) FROM {STAGE_TABLE}")
+            last_created = cur.fetchone()[0]
+            cur.execute(
+                f"INSERT INTO outpatient_case_event ({cols}) "
+                f"SELECT {cols} FROM {STAGE_TABLE} ON CONFLICT (event_id) DO NOTHING"
+            )
+            return cur.rowcount, last_created
+
+
+# Per-batch loaders; "binary" (transfer_binary) streams the whole delta instead.
+LOAD_METHODS = {"copy": copy_rows, "insert": insert_rows}
 
 
 def run_etl(
@@ -116,8 +250,18 @@ def run_etl(
     central_host: str, central_port: int, central_db: str, central_user: str, central_pass: str,
     source_id: str = "edge-collector",
     batch_size: int = 10000,
+    load_method: str = "copy",
+    commit_every: int = 10,
 ):
-    """Execute one ETL cycle: pull from edge, push to central."""
+    """Execute one ETL cycle: pull from edge, push to central.
+
+    Central writes are committed every ``commit_every`` batches and once at
+    the end together with the watermark, rather than after every batch.
+    """
+    if load_method != "binary" and load_method not in LOAD_METHODS:
+        raise ValueError(f"Unknown load method: {load_method}")
+    if commit_every < 1:
+        raise ValueError(f"commit_every must be at least 1, got {commit_every}")
     start_time = time.time()
 
     logger.info("Connecting to edge DB at %s:%d/%s", edge_host, edge_port, edge_db)
@@ -125,25 +269,38 @@ def run_etl(
 
     logger.info("Connecting to central DB at %s:%d/%s", central_host, central_port, central_db)
     central_conn = get_connection(central_host, central_port, central_db, central_user, central_pass)
+    central_conn.autocommit = False
 
     try:
         watermark = get_watermark(central_conn, source_id)
         logger.info("Current watermark for %s: %s", source_id, watermark)
 
+        if watermark is not None:
+            edge_max = edge_max_created(edge_conn)
+            if edge_max is None or edge_max <= watermark:
+                logger.info("No new rows on edge since %s, skipping transfer", watermark)
+                return 0
+
         total_rows = 0
         last_created = watermark
 
-        for batch in fetch_new_rows(edge_conn, watermark, batch_size):
-            inserted = insert_rows(central_conn, batch)
-            total_rows += inserted
-            if batch:
-                last_created = batch[-1]["created_at"]
-            central_conn.commit()
-            logger.info("Batch inserted: %d rows (total: %d)", inserted, total_rows)
+        if load_method == "binary":
+            total_rows, staged_max = transfer_binary(edge_conn, central_conn, watermark)
+            last_created = staged_max or watermark
+        else:
+            load_rows = LOAD_METHODS[load_method]
+            for n_batches, batch in enumerate(prefetch(fetch_new_rows(edge_conn, watermark, batch_size)), 1):
+                inserted = load_rows(central_conn, batch)
+                total_rows += inserted
+                if batch:
+                    last_created = batch[-1]["created_at"]
+                if n_batches % commit_every == 0:
+                    central_conn.commit()
+                logger.info("Batch inserted: %d rows (total: %d)", inserted, total_rows)
 
         if total_rows > 0 and last_created:
             update_watermark(central_conn, source_id, last_created, total_rows)
-            central_conn.commit()
+        central_conn.commit()
 
         elapsed = time.time() - start_time
         logger.info(
@@ -174,12 +331,19 @@ def main():
     # ETL config
     parser.add_argument("--source-id", default="edge-collector")
     parser.add_argument("--batch-size", type=int, default=10000)
+    parser.add_argument("--load-method", choices=sorted([*LOAD_METHODS, "binary"]), default="copy",
+                        help="copy: COPY via a staging table; insert: multi-row INSERT; "
+                             "binary: pipe edge COPY output straight into central")
+    parser.add_argument("--commit-every", type=int, default=10,
+                        help="Commit the central transaction every N batches")
 
     args = parser.parse_args()
+    if args.commit_every < 1:
+        parser.error("--commit-every must be at least 1")
     run_etl(
         args.edge_host, args.edge_port, args.edge_db, args.edge_user, args.edge_pass,
         args.central_host, args.central_port, args.central_db, args.central_user, args.central_pass,
-        args.source_id, args.batch_size,
+        args.source_id, args.batch_size, args.load_method, args.commit_every,
     )
 
 
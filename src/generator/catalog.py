@@ -8,6 +8,7 @@ value in minutes = exp(Normal(mu, sigma)).
 """
 
 from dataclasses import dataclass
+from itertools import accumulate
 from typing import Dict, List, Tuple
 
 @dataclass(frozen=True)
@@ -56,6 +57,13 @@ ANESTHESIA_TYPES: Dict[str, List[Tuple[str, float]]] = {
     "Cardiology":    [("MAC", 0.4), ("Conscious sedation", 0.3), ("General", 0.3)],
 }
 
+# Per service line: (anesthesia names, cumulative weights) for bisect-based picks
+ANESTHESIA_TABLES: Dict[str, Tuple[Tuple[str, ...], List[float]]] = {
+    sl: (tuple(name for name, _ in choices), list(accumulate(w for _, w in choices)))
+    for sl, choices in ANESTHESIA_TYPES.items()
+}
+DEFAULT_ANESTHESIA_TABLE: Tuple[Tuple[str, ...], List[float]] = (("General",), [1.0])
+
 PROCEDURES: List[ProcedureDef] = [
     # GI / Endoscopy
     ProcedureDef("Diagnostic colonoscopy",              "GI", (2.71,0.35),(2.89,0.30),(2.89,0.25),(3.22,0.35)),
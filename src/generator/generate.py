@@ -11,6 +11,9 @@ Generates realistic outpatient surgical case events with:
 
 import argparse
 import csv
+import gzip
+import hashlib
+import io
 import json
 import logging
 import math
@@ -18,11 +21,30 @@ import os
 import random
 import sys
 import uuid
+from bisect import bisect_left
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime, timedelta, timezone
-from typing import Dict, List, Optional, Tuple
+from functools import lru_cache
+from itertools import accumulate
+from operator import itemgetter
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+except ImportError:
+    pa = None
 
 from .catalog import (
-    ANESTHESIA_TYPES,
+    ANESTHESIA_TABLES,
+    DEFAULT_ANESTHESIA_TABLE,
     FACILITIES,
     PROCEDURES,
     ProcedureDef,
@@ -40,17 +62,49 @@ CHECKIN_HOUR_WEIGHTS = [
     0.0, 0.0, 0.0, 0.0, 0.0, 0.0,    # 18-23
 ]
 
+CSV_FIELDS = [
+    "event_id", "facility_id", "procedure_type", "scheduled_start_time",
+    "checkin_time", "preop_start_time", "op_start_time",
+    "postop_start_time", "discharge_time", "anesthesia_type",
+    "asa_class", "case_status", "source_generator_id",
+]
+CSV_SCHEMA = pa.schema(
+    [(f, pa.int64() if f == "asa_class" else pa.string()) for f in CSV_FIELDS]
+) if pa is not None else None
+CHECKIN_HOURS = tuple(range(24))
+CHECKIN_CUM = list(accumulate(CHECKIN_HOUR_WEIGHTS))
+
+# ASA class (1-4 typical, 5-6 rare)
+ASA_CLASSES = (1, 2, 3, 4, 5, 6)
+ASA_CUM = list(accumulate([0.15, 0.40, 0.30, 0.12, 0.02, 0.01]))
+
+# Case statuses by status-roll bucket: rare events below each threshold, else completed
+CASE_STATUS_THRESHOLDS = (0.02, 0.03, 0.06)
+CASE_STATUSES = ("canceled", "converted_to_inpatient", "delayed", "completed")
+
+# Procedure catalog as parallel arrays indexed like PROCEDURES, for the batched path.
+# Log-normal (mu, sigma) per procedure and phase, shape (n_procedures, 4)
+PHASES = ("checkin_to_preop", "preop_to_op", "op_to_postop", "postop_to_discharge")
+_PHASE_PARAMS = np.array([[getattr(p, ph) for ph in PHASES] for p in PROCEDURES])
+PROC_MU = _PHASE_PARAMS[..., 0]
+PROC_SIGMA = _PHASE_PARAMS[..., 1]
+PROC_TYPES = tuple(p.procedure_type for p in PROCEDURES)
+PROC_ANESTHESIA = tuple(ANESTHESIA_TABLES.get(p.service_line, DEFAULT_ANESTHESIA_TABLE) for p in PROCEDURES)
+
+
+def _bisect_pick(items: Sequence, cum: Sequence[float], u: float):
+    """Pick from ``items`` for a uniform draw ``u`` in [0, 1) over cumulative weights."""
+    return items[bisect_left(cum, u * cum[-1])]
+
+
+def _pick_cumulative(items: Sequence, cum: Sequence[float], rng: random.Random):
+    """Weighted random selection over precomputed cumulative weights."""
+    return _bisect_pick(items, cum, rng.random())
+
 
 def _weighted_choice(items: list, weights: list, rng: random.Random):
     """Weighted random selection."""
-    total = sum(weights)
-    r = rng.random() * total
-    cumulative = 0.0
-    for item, w in zip(items, weights):
-        cumulative += w
-        if r <= cumulative:
-            return item
-    return items[-1]
+    return _pick_cumulative(items, list(accumulate(weights)), rng)
 
 
 def _sample_lognormal(mu: float, sigma: float, rng: random.Random,
@@ -60,6 +114,13 @@ def _sample_lognormal(mu: float, sigma: float, rng: random.Random,
     return max(min_val, min(val, max_val))
 
 
+def _sample_durations(proc_idx: np.ndarray, rng: np.random.Generator,
+                      min_val: float = 3.0, max_val: float = 600.0) -> np.ndarray:
+    """Sample all four phase durations for each procedure index in one call, shape (N, 4)."""
+    out = rng.lognormal(PROC_MU[proc_idx], PROC_SIGMA[proc_idx])
+    return np.clip(out, min_val, max_val, out=out)
+
+
 def _build_procedure_weights(facility_id: str) -> Tuple[List[ProcedureDef], List[float]]:
     """Build weighted procedure list based on facility bias."""
     facility = FACILITIES[facility_id]
@@ -73,79 +134,83 @@ def _build_procedure_weights(facility_id: str) -> Tuple[List[ProcedureDef], List
     return procs, weights
 
 
+@lru_cache(maxsize=None)
+def _procedure_cum_weights(facility_id: str) -> np.ndarray:
+    """Cumulative procedure weights for a facility, aligned with PROCEDURES."""
+    return np.cumsum(_build_procedure_weights(facility_id)[1])
+
+
 def _pick_anesthesia(service_line: str, rng: random.Random) -> str:
     """Pick anesthesia type based on service line weights."""
-    choices = ANESTHESIA_TYPES.get(service_line, [("General", 1.0)])
-    types, weights = zip(*choices)
-    return _weighted_choice(list(types), list(weights), rng)
+    return _pick_cumulative(*ANESTHESIA_TABLES.get(service_line, DEFAULT_ANESTHESIA_TABLE), rng)
 
 
-def generate_case(
-    facility_id: str,
-    base_date: datetime,
-    procedure: ProcedureDef,
-    rng: random.Random,
-    generator_id: str = "gen-v1",
-) -> Optional[Dict]:
-    """Generate a single outpatient case event."""
+def _uuid4_strings(rng: np.random.Generator, n: int) -> List[str]:
+    """Draw ``n`` random (version 4) UUID strings from one ``rng.bytes`` call."""
+    arr = np.frombuffer(rng.bytes(16 * n), dtype=np.uint8).reshape(n, 16).copy()
+    arr[:, 6] = (arr[:, 6] & 0x0F) | 0x40  # version 4
+    arr[:, 8] = (arr[:, 8] & 0x3F) | 0x80  # RFC 4122 variant
+    h = arr.tobytes().hex()
+    return [f"{h[i:i + 8]}-{h[i + 8:i + 12]}-{h[i + 12:i + 16]}-{h[i + 16:i + 20]}-{h[i + 20:i + 32]}"
+            for i in range(0, 32 * n, 32)]
 
-    # Pick check-in hour based on hourly distribution
-    hour = _weighted_choice(list(range(24)), CHECKIN_HOUR_WEIGHTS, rng)
-    minute = rng.randint(0, 59)
-    second = rng.randint(0, 59)
 
-    checkin_time = base_date.replace(hour=hour, minute=minute, second=second, microsecond=0)
+def _as_generator(rng: Union[random.Random, np.random.Generator]) -> np.random.Generator:
+    """Return ``rng`` as a NumPy Generator, seeding one from a ``random.Random``."""
+    if isinstance(rng, np.random.Generator):
+        return rng
+    return np.random.Generator(np.random.SFC64(rng.getrandbits(64)))
 
-    # Generate durations
-    d1 = _sample_lognormal(*procedure.checkin_to_preop, rng)
-    d2 = _sample_lognormal(*procedure.preop_to_op, rng)
-    d3 = _sample_lognormal(*procedure.op_to_postop, rng)
-    d4 = _sample_lognormal(*procedure.postop_to_discharge, rng)
 
+def _build_case(
+    facility_id: str,
+    checkin_time: datetime,
+    procedure: ProcedureDef,
+    durations: Sequence[float],
+    schedule_offset: float,
+    status_roll: float,
+    u1: float,
+    u2: float,
+    asa_class: int,
+    anesthesia_type: str,
+    event_id: str,
+    generator_id: str,
+) -> Dict:
+    """Assemble one case from pre-drawn random inputs (``u1``/``u2`` uniform in [0, 1))."""
+    d1, d2, d3, d4 = durations
     preop_start = checkin_time + timedelta(minutes=d1)
     op_start = preop_start + timedelta(minutes=d2)
     postop_start = op_start + timedelta(minutes=d3)
     discharge_time = postop_start + timedelta(minutes=d4)
 
     # Scheduled start (op_start ± some variance)
-    schedule_offset = rng.gauss(0, 10)  # minutes early/late
     scheduled_start = op_start - timedelta(minutes=schedule_offset)
 
     # Case status with rare events
-    status_roll = rng.random()
     if status_roll < 0.02:
         case_status = "canceled"
         # Canceled cases: only have checkin and maybe preop
-        preop_start = checkin_time + timedelta(minutes=rng.uniform(5, 20))
+        preop_start = checkin_time + timedelta(minutes=5 + 15 * u1)
         op_start = preop_start  # same as preop for canceled
         postop_start = op_start
-        discharge_time = preop_start + timedelta(minutes=rng.uniform(10, 30))
+        discharge_time = preop_start + timedelta(minutes=10 + 20 * u2)
     elif status_roll < 0.03:
         case_status = "converted_to_inpatient"
         # Extended postop
-        d4_extended = d4 * rng.uniform(2.0, 5.0)
+        d4_extended = d4 * (2.0 + 3.0 * u1)
         discharge_time = postop_start + timedelta(minutes=d4_extended)
     elif status_roll < 0.06:
         case_status = "delayed"
         # Add delay to op_start
-        delay = rng.uniform(15, 90)
+        delay = 15 + 75 * u1
         op_start = op_start + timedelta(minutes=delay)
         postop_start = op_start + timedelta(minutes=d3)
         discharge_time = postop_start + timedelta(minutes=d4)
     else:
         case_status = "completed"
 
-    # ASA class (1-4 typical, 5-6 rare)
-    asa_weights = [0.15, 0.40, 0.30, 0.12, 0.02, 0.01]
-    asa_class = _weighted_choice([1, 2, 3, 4, 5, 6], asa_weights, rng)
-
-    anesthesia_type = _pick_anesthesia(procedure.service_line, rng)
-
-    # Deterministic UUID from rng for reproducibility
-    event_uuid = uuid.UUID(int=rng.getrandbits(128), version=4)
-
     return {
-        "event_id": str(event_uuid),
+        "event_id": event_id,
         "facility_id": facility_id,
         "procedure_type": procedure.procedure_type,
         "scheduled_start_time": scheduled_start.isoformat(),
@@ -161,76 +226,260 @@ def generate_case(
     }
 
 
+def generate_case(
+    facility_id: str,
+    base_date: datetime,
+    procedure: ProcedureDef,
+    rng: random.Random,
+    generator_id: str = "gen-v1",
+    durations: Optional[Sequence[float]] = None,
+) -> Optional[Dict]:
+    """Generate a single outpatient case event.
+
+    ``durations`` are pre-sampled phase minutes (see ``_sample_durations``);
+    they are drawn from ``rng`` when omitted.
+    """
+
+    # Pick check-in hour based on hourly distribution
+    hour = _pick_cumulative(CHECKIN_HOURS, CHECKIN_CUM, rng)
+    minute = rng.randint(0, 59)
+    second = rng.randint(0, 59)
+
+    checkin_time = base_date.replace(hour=hour, minute=minute, second=second, microsecond=0)
+
+    # Generate durations
+    if durations is None:
+        durations = (
+            _sample_lognormal(*procedure.checkin_to_preop, rng),
+            _sample_lognormal(*procedure.preop_to_op, rng),
+            _sample_lognormal(*procedure.op_to_postop, rng),
+            _sample_lognormal(*procedure.postop_to_discharge, rng),
+        )
+
+    schedule_offset = rng.gauss(0, 10)  # minutes early/late
+    status_roll = rng.random()
+    u1, u2 = rng.random(), rng.random()
+    asa_class = _pick_cumulative(ASA_CLASSES, ASA_CUM, rng)
+    anesthesia_type = _pick_anesthesia(procedure.service_line, rng)
+
+    # Deterministic UUID from rng for reproducibility
+    event_id = str(uuid.UUID(int=rng.getrandbits(128), version=4))
+
+    return _build_case(
+        facility_id, checkin_time, procedure, durations, schedule_offset,
+        status_roll, u1, u2, asa_class, anesthesia_type, event_id, generator_id,
+    )
+
+
+def _iso_strings(times: np.ndarray, suffix: str) -> List[str]:
+    """Format datetime64 wall-clock times as ISO 8601 strings with a UTC offset suffix."""
+    return [s + suffix for s in np.datetime_as_string(times, unit="us").tolist()]
+
+
 def generate_day(
     facility_id: str,
     date: datetime,
-    rng: random.Random,
+    rng: Union[random.Random, np.random.Generator],
     generator_id: str = "gen-v1",
 ) -> List[Dict]:
-    """Generate all cases for a facility on a given day."""
+    """Generate all cases for a facility on a given day.
+
+    Every random input for the day is drawn up front as NumPy arrays and the
+    timeline is computed as ``datetime64`` offsets from each check-in; only
+    the final dict assembly runs per case.
+    """
+    rng = _as_generator(rng)
     facility = FACILITIES[facility_id]
     vol_min, vol_max = facility["daily_volume"]
-    num_cases = rng.randint(vol_min, vol_max)
+    n = int(rng.integers(vol_min, vol_max, endpoint=True))
+
+    cum = _procedure_cum_weights(facility_id)
+    proc_idx = np.searchsorted(cum, rng.random(n) * cum[-1], side="right")
+    durations = _sample_durations(proc_idx, rng)
+    # Check-in second of day: weighted hour plus a uniform second within it
+    hours = np.searchsorted(CHECKIN_CUM, rng.random(n) * CHECKIN_CUM[-1], side="right")
+    checkin_secs = hours * 3600 + rng.integers(0, 3600, n)
+    schedule_offsets = rng.normal(0, 10, n)
+    status_rolls = rng.random(n)
+    u1s, u2s = rng.random((2, n))
+    asa_idx = np.searchsorted(ASA_CUM, rng.random(n) * ASA_CUM[-1], side="right").tolist()
+    anesthesia_u = rng.random(n).tolist()
+    event_ids = _uuid4_strings(rng, n)
+
+    # Minutes after check-in for preop, op, postop and discharge; scheduled
+    # start is taken from the op start before any status effect
+    offsets = np.cumsum(durations, axis=1)
+    scheduled = offsets[:, 1] - schedule_offsets
+
+    # Case status with rare events, applied as masks over the whole day
+    status_codes = np.searchsorted(CASE_STATUS_THRESHOLDS, status_rolls, side="right")
+    canceled, converted, delayed = (status_codes == k for k in range(3))
+    # Delay pushes op start and everything after it
+    offsets[:, 1:] += np.where(delayed, 15 + 75 * u1s, 0.0)[:, None]
+    # Extended postop
+    offsets[:, 3] = np.where(converted, offsets[:, 2] + durations[:, 3] * (2.0 + 3.0 * u1s), offsets[:, 3])
+    # Canceled cases: only have checkin and maybe preop
+    preop = 5 + 15 * u1s
+    canceled_offsets = np.column_stack((preop, preop, preop, preop + 10 + 20 * u2s))
+    offsets = np.where(canceled[:, None], canceled_offsets, offsets)
+
+    # Wall-clock arithmetic in the date's own offset, like aware datetime + timedelta
+    day = np.datetime64(date.replace(tzinfo=None, hour=0, minute=0, second=0, microsecond=0), "us")
+    suffix = date.isoformat()[len(date.replace(tzinfo=None).isoformat()):]
+    checkin = day + checkin_secs.astype("timedelta64[s]")
+    phase_times = checkin[:, None] + np.rint(offsets * 60e6).astype("timedelta64[us]")
+    scheduled_times = checkin + np.rint(scheduled * 60e6).astype("timedelta64[us]")
+
+    proc_idx = proc_idx.tolist()
+    anesthesia = [_bisect_pick(*PROC_ANESTHESIA[p], u) for p, u in zip(proc_idx, anesthesia_u)]
+    columns = zip(
+        event_ids,
+        proc_idx,
+        _iso_strings(scheduled_times, suffix),
+        _iso_strings(checkin, suffix),
+        *(_iso_strings(phase_times[:, k], suffix) for k in range(4)),
+        anesthesia,
+        asa_idx,
+        status_codes.tolist(),
+    )
+    return [
+        {
+            "event_id": event_id,
+            "facility_id": facility_id,
+            "procedure_type": PROC_TYPES[p],
+            "scheduled_start_time": sched,
+            "checkin_time": checkin_time,
+            "preop_start_time": preop_start,
+            "op_start_time": op_start,
+            "postop_start_time": postop_start,
+            "discharge_time": discharge_time,
+            "anesthesia_type": anesthesia_type,
+            "asa_class": ASA_CLASSES[a],
+            "case_status": CASE_STATUSES[status],
+            "source_generator_id": generator_id,
+        }
+        for (event_id, p, sched, checkin_time, preop_start, op_start, postop_start,
+             discharge_time, anesthesia_type, a, status) in columns
+    ]
 
-    procs, weights = _build_procedure_weights(facility_id)
-    cases = []
-    for _ in range(num_cases):
-        proc = _weighted_choice(procs, weights, rng)
-        case = generate_case(facility_id, date, proc, rng, generator_id)
-        if case:
-            cases.append(case)
-    return cases
 
+def _task_seed(seed: int, facility_id: str, date: datetime) -> int:
+    """Derive an independent RNG seed for one facility-day from the batch seed."""
+    key = f"{seed}:{facility_id}:{date.date().isoformat()}".encode()
+    return int.from_bytes(hashlib.blake2b(key, digest_size=8).digest(), "little")
 
-def generate_batch(
+
+def _generate_task(task: Tuple[str, datetime, int, str]) -> List[Dict]:
+    facility_id, date, task_seed, generator_id = task
+    return generate_day(facility_id, date, np.random.Generator(np.random.SFC64(task_seed)), generator_id)
+
+
+def iter_batches(
     start_date: datetime,
     end_date: datetime,
     seed: int = 42,
     generator_id: str = "gen-v1",
-) -> List[Dict]:
-    """Generate cases for all facilities over a date range."""
-    rng = random.Random(seed)
-    all_cases = []
+    workers: int = 1,
+) -> Iterator[List[Dict]]:
+    """Yield one list of cases per facility-day over a date range.
+
+    Each facility-day is seeded from ``(seed, facility, date)``, so the output
+    is the same whether it runs serially or on ``workers`` processes.
+    """
+    tasks = []
     current = start_date
     while current <= end_date:
         # Skip weekends (most ASCs closed)
         if current.weekday() < 5:
             for facility_id in FACILITIES:
-                day_cases = generate_day(facility_id, current, rng, generator_id)
-                all_cases.append(day_cases)
-                logger.info(
-                    "Generated %d cases for %s on %s",
-                    len(day_cases), facility_id, current.strftime("%Y-%m-%d"),
-                )
+                tasks.append((facility_id, current, _task_seed(seed, facility_id, current), generator_id))
         current += timedelta(days=1)
-    # Flatten
-    flat = [c for day in all_cases for c in day]
+
+    pool = None
+    if workers > 1 and len(tasks) > 1:
+        pool = ProcessPoolExecutor(max_workers=workers)
+        results = pool.map(_generate_task, tasks, chunksize=max(1, len(tasks) // (workers * 4)))
+    else:
+        results = map(_generate_task, tasks)
+
+    try:
+        for (facility_id, day, _, _), day_cases in zip(tasks, results):
+            logger.info(
+                "Generated %d cases for %s on %s",
+                len(day_cases), facility_id, day.strftime("%Y-%m-%d"),
+            )
+            yield day_cases
+    finally:
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+
+
+def generate_batch(
+    start_date: datetime,
+    end_date: datetime,
+    seed: int = 42,
+    generator_id: str = "gen-v1",
+    workers: int = 1,
+) -> List[Dict]:
+    """Generate cases for all facilities over a date range as one flat list."""
+    flat = [
+        c
+        for day in iter_batches(start_date, end_date, seed, generator_id, workers)
+        for c in day
+    ]
     logger.info("Total cases generated: %d", len(flat))
     return flat
 
 
+def _open_output(path: str, binary: bool = False):
+    """Open ``path`` for writing, gzip-compressed when it ends in ``.gz``.
+
+    Level 1 keeps compression cheap; mtime=0 keeps the output reproducible.
+    """
+    if path.endswith(".gz"):
+        f = gzip.GzipFile(path, "wb", compresslevel=1, mtime=0)
+        return f if binary else io.TextIOWrapper(f, encoding="utf-8", newline="")
+    return open(path, "wb") if binary else open(path, "w", newline="")
+
+
 def write_csv(cases: List[Dict], output_path: str):
-    """Write cases to CSV file."""
+    """Write cases to CSV file (pyarrow's C writer when available; gzip for .gz)."""
     if not cases:
         logger.warning("No cases to write")
         return
-    fieldnames = [
-        "event_id", "facility_id", "procedure_type", "scheduled_start_time",
-        "checkin_time", "preop_start_time", "op_start_time",
-        "postop_start_time", "discharge_time", "anesthesia_type",
-        "asa_class", "case_status", "source_generator_id",
-    ]
-    with open(output_path, "w", newline="") as f:
-        writer = csv.DictWriter(f, fieldnames=fieldnames)
-        writer.writeheader()
-        writer.writerows(cases)
-    logger.info("Wrote %d cases to %s", len(cases), output_path)
+    write_csv_batches([cases], output_path)
+
+
+def write_csv_batches(batches: Iterable[List[Dict]], output_path: str) -> int:
+    """Stream per-day case lists to a CSV file without holding the full horizon."""
+    total = 0
+    if pa is not None:
+        with _open_output(output_path, binary=True) as f, \
+                pa_csv.CSVWriter(f, CSV_SCHEMA) as writer:
+            for cases in batches:
+                if cases:
+                    writer.write_batch(pa.RecordBatch.from_pylist(cases, schema=CSV_SCHEMA))
+                    total += len(cases)
+    else:
+        row = itemgetter(*CSV_FIELDS)
+        with _open_output(output_path) as f:
+            writer = csv.writer(f)
+            writer.writerow(CSV_FIELDS)
+            for cases in batches:
+                writer.writerows(map(row, cases))
+                total += len(cases)
+    logger.info("Wrote %d cases to %s", total, output_path)
+    return total
 
 
 def write_json(cases: List[Dict], output_path: str):
-    """Write cases to JSON file."""
-    with open(output_path, "w") as f:
-        json.dump(cases, f, indent=2, default=str)
+    """Write cases to JSON file (gzip for .gz)."""
+    if orjson is not None:
+        with _open_output(output_path, binary=True) as f:
+            f.write(orjson.dumps(cases, default=str, option=orjson.OPT_INDENT_2))
+    else:
+        with _open_output(output_path) as f:
+            json.dump(cases, f, indent=2, default=str)
     logger.info("Wrote %d cases to %s", len(cases), output_path)
 
 
@@ -247,9 +496,13 @@ def main():
         help="End date (YYYY-MM-DD)",
     )
     parser.add_argument("--seed", type=int, default=42, help="Random seed")
+    parser.add_argument(
+        "--workers", type=int, default=1,
+        help="Worker processes for generation (output is identical for any value)",
+    )
     parser.add_argument(
         "--output", type=str, default="output/cases.csv",
-        help="Output file path (.csv or .json)",
+        help="Output file path (.csv or .json; add .gz to compress)",
     )
     parser.add_argument(
         "--format", choices=["csv", "json"], default="csv",
@@ -265,14 +518,19 @@ def main():
     start = datetime.strptime(args.start_date, "%Y-%m-%d").replace(tzinfo=timezone.utc)
     end = datetime.strptime(args.end_date, "%Y-%m-%d").replace(tzinfo=timezone.utc)
 
-    cases = generate_batch(start, end, seed=args.seed, generator_id=args.generator_id)
-
     os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
 
     if args.format == "json":
+        cases = generate_batch(start, end, seed=args.seed, generator_id=args.generator_id,
+                               workers=args.workers)
         write_json(cases, args.output)
     else:
-        write_csv(cases, args.output)
+        # CSV is written day by day, so memory stays flat over long horizons
+        write_csv_batches(
+            iter_batches(start, end, seed=args.seed, generator_id=args.generator_id,
+                         workers=args.workers),
+            args.output,
+        )
 
 
 if __name__ == "__main__":
@@ -13,9 +13,15 @@ import argparse
 import html as html_mod
 import logging
 import os
+import stat
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone
-from http.server import HTTPServer, SimpleHTTPRequestHandler
-from pathlib import Path
+from email.utils import formatdate
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from operator import itemgetter
+from functools import lru_cache
+from typing import BinaryIO, Dict, Optional, Tuple
 from urllib.parse import quote
 
 logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
@@ -64,62 +70,26 @@ a.card:hover{border-color:var(--accent);box-shadow:0 2px 8px rgba(88,166,255,.1)
 """
 
 
-def build_landing(report_dir: str) -> str:
-    """Build the landing page HTML listing all report files."""
-    reports = []
-    report_path = Path(report_dir)
-
-    for f in sorted(report_path.rglob("*.html"), key=lambda p: p.stat().st_mtime, reverse=True):
-        rel = f.relative_to(report_path)
-        stat = f.stat()
-        size_kb = stat.st_size / 1024
-        mtime = datetime.fromtimestamp(stat.st_mtime, tz=timezone.utc)
-        reports.append((str(rel), f.stem, size_kb, mtime))
-
-    json_files = []
-    for f in sorted(report_path.rglob("*.json"), key=lambda p: p.stat().st_mtime, reverse=True):
-        rel = f.relative_to(report_path)
-        stat = f.stat()
-        json_files.append((str(rel), f.stem, stat.st_size / 1024,
-                           datetime.fromtimestamp(stat.st_mtime, tz=timezone.utc)))
-
-    cards_html = []
-    for rel, name, size_kb, mtime in reports:
-        nice_name = name.replace("_", " ").replace("-", " ").title()
-        cards_html.append(f"""
-        <a class="card" href="/reports/{quote(rel)}" target="_blank">
-          <div class="card-title">{html_mod.escape(nice_name)} <span class="tag tag-html">HTML</span></div>
-          <div class="card-meta">
-            <span>{html_mod.escape(rel)}</span>
-            <span>{size_kb:.0f} KB</span>
-            <span>{mtime.strftime('%Y-%m-%d %H:%M')} UTC</span>
-          </div>
-        </a>""")
+CONTENT_TYPES = {".html": "text/html", ".json": "application/json", ".csv": "text/csv"}
+# Reports are rewritten in place by each pipeline run, so keep the window short;
+# after it expires browsers revalidate with If-None-Match and usually get a 304.
+REPORT_CACHE_CONTROL = "public, max-age=60"
+# Refuse to open a symlink as the final path component where the OS supports it
+_O_NOFOLLOW = getattr(os, "O_NOFOLLOW", 0)
 
-    for rel, name, size_kb, mtime in json_files:
-        nice_name = name.replace("_", " ").replace("-", " ").title()
-        cards_html.append(f"""
-        <a class="card" href="/reports/{quote(rel)}" target="_blank">
-          <div class="card-title">{html_mod.escape(nice_name)} <span class="tag tag-json">JSON</span></div>
+CARD_TMPL = """
+        <a class="card" href="/reports/{href}" target="_blank">
+          <div class="card-title">{title} <span class="tag tag-{kind}">{label}</span></div>
           <div class="card-meta">
-            <span>{html_mod.escape(rel)}</span>
+            <span>{rel}</span>
             <span>{size_kb:.0f} KB</span>
-            <span>{mtime.strftime('%Y-%m-%d %H:%M')} UTC</span>
+            <span>{mtime:%Y-%m-%d %H:%M} UTC</span>
           </div>
-        </a>""")
+        </a>"""
 
-    if not cards_html:
-        cards_html.append(
-            '<div class="empty"><strong>No reports available</strong>'
-            'Run the analytics pipeline to generate reports.</div>')
-
-    count_section = f"""
-    <div class="counts">
-      <span><span class="dot dot-html"></span>{len(reports)} report{"s" if len(reports) != 1 else ""}</span>
-      <span><span class="dot dot-json"></span>{len(json_files)} data file{"s" if len(json_files) != 1 else ""}</span>
-    </div>"""
 
-    return f"""<!DOCTYPE html>
+# Static page shell around the counts and card grid, encoded once
+_PAGE_HEAD = f"""<!DOCTYPE html>
 <html lang="en">
 <head>
 <meta charset="utf-8"/>
@@ -131,24 +101,174 @@ def build_landing(report_dir: str) -> str:
   <div class="header">
     <h1>Outpatient Flow Analytics</h1>
     <div class="subtitle">Report Viewer</div>
-    {count_section}
+    """.encode()
+_PAGE_GRID = b"""
   </div>
   <div class="grid">
-    {"".join(cards_html)}
+    """
+_PAGE_TAIL = b"""
   </div>
   <div class="footer">Outpatient Flow Analytics &middot; OpenShift 4.21</div>
 </body>
 </html>"""
 
 
+@lru_cache(maxsize=16)
+def _realpath(path: str) -> str:
+    return os.path.realpath(path)
+
+
+@lru_cache(maxsize=4096)
+def _nice_name(stem: str) -> str:
+    return html_mod.escape(stem.replace("_", " ").replace("-", " ").title())
+
+
+@lru_cache(maxsize=4096)
+def _rel_href_text(rel: str) -> Tuple[str, str]:
+    return quote(rel), html_mod.escape(rel)
+
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Weak If-None-Match comparison (RFC 9110 13.1.2) against our strong ``etag``."""
+    if not if_none_match:
+        return False
+    tags = [t.strip() for t in if_none_match.split(",")]
+    return "*" in tags or any(t.removeprefix("W/") == etag for t in tags)
+
+
+def _accepts_gzip(accept_encoding: Optional[str]) -> bool:
+    """True if an Accept-Encoding header allows gzip (and doesn't give it q=0)."""
+    for part in (accept_encoding or "").split(","):
+        coding, _, params = part.partition(";")
+        if coding.strip().lower() in ("gzip", "*"):
+            q = params.strip().lower()
+            if not q.startswith("q="):
+                return True
+            try:
+                return float(q[2:]) > 0
+            except ValueError:
+                return False
+    return False
+
+
+def _scan_dir(path: str, rel_dir: str, by_suffix: Dict[str, list]) -> None:
+    subdirs = []
+    try:
+        with os.scandir(path) as it:
+            for entry in it:
+                if entry.is_dir(follow_symlinks=False):
+                    subdirs.append(entry)
+                    continue
+                stem, suffix = os.path.splitext(entry.name)
+                bucket = by_suffix.get(suffix)
+                if bucket is None:
+                    continue
+                try:
+                    st = entry.stat()
+                except OSError:
+                    continue  # dangling symlink or removed mid-scan
+                bucket.append((st.st_mtime, rel_dir + entry.name, stem, st.st_size / 1024))
+    except OSError:
+        return
+    # Files before subdirectories, matching a top-down walk
+    for entry in subdirs:
+        _scan_dir(entry.path, rel_dir + entry.name + os.sep, by_suffix)
+
+
+def _scan_reports(report_dir: str) -> Dict[str, list]:
+    """Scan ``report_dir`` once; return ``(mtime, rel, stem, size_kb)`` per .html/.json file."""
+    by_suffix = {".html": [], ".json": []}
+    _scan_dir(report_dir, "", by_suffix)
+    return by_suffix
+
+
+def build_landing(report_dir: str) -> bytes:
+    """Build the UTF-8 landing page listing all report files."""
+    by_suffix = _scan_reports(report_dir)
+    reports, json_files = (
+        sorted(by_suffix[suffix], key=itemgetter(0), reverse=True) for suffix in (".html", ".json")
+    )
+
+    cards_html = [
+        CARD_TMPL.format(
+            href=href, title=_nice_name(name), kind=kind, label=label,
+            rel=rel_text, size_kb=size_kb,
+            mtime=datetime.fromtimestamp(mtime, tz=timezone.utc),
+        )
+        for entries, kind, label in ((reports, "html", "HTML"), (json_files, "json", "JSON"))
+        for mtime, rel, name, size_kb in entries
+        for href, rel_text in (_rel_href_text(rel),)
+    ]
+
+    if not cards_html:
+        cards_html.append(
+            '<div class="empty"><strong>No reports available</strong>'
+            'Run the analytics pipeline to generate reports.</div>')
+
+    count_section = f"""
+    <div class="counts">
+      <span><span class="dot dot-html"></span>{len(reports)} report{"s" if len(reports) != 1 else ""}</span>
+      <span><span class="dot dot-json"></span>{len(json_files)} data file{"s" if len(json_files) != 1 else ""}</span>
+    </div>"""
+
+    return b"".join((
+        _PAGE_HEAD, count_section.encode(), _PAGE_GRID, "".join(cards_html).encode(), _PAGE_TAIL,
+    ))
+
+
 class ReportHandler(SimpleHTTPRequestHandler):
     """HTTP handler that serves the landing page and report files."""
 
     report_dir: str = "output/analytics"
+    # Persistent connections: every response carries Content-Length, and idle
+    # sockets are dropped after ``timeout`` seconds so they can't pin pool threads.
+    protocol_version = "HTTP/1.1"
+    timeout = 5
+    # Headers and body go out as separate writes; with Nagle on, the body of
+    # every response after the first on a connection waits for a delayed ACK.
+    disable_nagle_algorithm = True
+    # Rendered landing page keyed by the report dir mtime; max age bounds staleness
+    # for in-place rewrites and nested directories, which leave that mtime alone.
+    landing_max_age: float = 5.0
+    _landing_cache: Optional[Tuple[int, float, bytes]] = None
+
+    def _landing_bytes(self) -> bytes:
+        try:
+            dir_mtime = os.stat(self.report_dir).st_mtime_ns
+        except OSError:
+            dir_mtime = -1  # not created yet; renders the empty state
+        now = time.monotonic()
+        cached = ReportHandler._landing_cache
+        if cached and cached[0] == dir_mtime and now - cached[1] < self.landing_max_age:
+            return cached[2]
+        content = build_landing(self.report_dir)
+        ReportHandler._landing_cache = (dir_mtime, now, content)
+        return content
+
+    def _open_report(self, rel: str) -> Optional[Tuple[BinaryIO, os.stat_result]]:
+        """Open a file under report_dir for ``rel``; ``None`` if it is outside or not a regular file."""
+        root = _realpath(self.report_dir)
+        candidate = os.path.normpath(os.path.join(root, rel))
+        if not candidate.startswith(root + os.sep):
+            return None
+        # Only nested paths can pass through a symlinked directory; top-level
+        # files skip the realpath walk entirely.
+        parent = os.path.dirname(candidate)
+        if parent != root and not os.path.realpath(parent).startswith(root + os.sep):
+            return None
+        try:
+            fd = os.open(candidate, os.O_RDONLY | _O_NOFOLLOW)
+        except OSError:
+            return None
+        st = os.fstat(fd)
+        if not stat.S_ISREG(st.st_mode):
+            os.close(fd)
+            return None
+        return open(fd, "rb"), st
 
     def do_GET(self):
         if self.path == "/" or self.path == "/index.html":
-            content = build_landing(self.report_dir).encode()
+            content = self._landing_bytes()
             self.send_response(200)
             self.send_header("Content-Type", "text/html; charset=utf-8")
             self.send_header("Content-Length", str(len(content)))
@@ -156,22 +276,52 @@ class ReportHandler(SimpleHTTPRequestHandler):
             self.wfile.write(content)
         elif self.path.startswith("/reports/"):
             rel = self.path[len("/reports/"):]
-            file_path = Path(self.report_dir) / rel
-            if file_path.is_file() and file_path.resolve().is_relative_to(Path(self.report_dir).resolve()):
-                content = file_path.read_bytes()
-                ctype = "text/html" if file_path.suffix == ".html" else \
-                        "application/json" if file_path.suffix == ".json" else \
-                        "text/csv" if file_path.suffix == ".csv" else "application/octet-stream"
-                self.send_response(200)
-                self.send_header("Content-Type", f"{ctype}; charset=utf-8")
-                self.send_header("Content-Length", str(len(content)))
-                self.end_headers()
-                self.wfile.write(content)
+            opened = self._open_report(rel)
+            if opened is not None:
+                f, st = opened
+                encoding = None
+                # Serve a precompressed <name>.gz sibling when the client takes
+                # gzip and the sibling is at least as new as the original.
+                if _accepts_gzip(self.headers.get("Accept-Encoding")):
+                    gz = self._open_report(rel + ".gz")
+                    if gz is not None and gz[1].st_mtime_ns >= st.st_mtime_ns:
+                        f.close()
+                        (f, st), encoding = gz, "gzip"
+                    elif gz is not None:
+                        gz[0].close()
+                etag = f'"{st.st_mtime_ns:x}-{st.st_size:x}"'
+                with f:
+                    if _etag_matches(self.headers.get("If-None-Match"), etag):
+                        self.send_response(304)
+                        self.send_header("Vary", "Accept-Encoding")
+                        self.send_header("ETag", etag)
+                        self.send_header("Cache-Control", REPORT_CACHE_CONTROL)
+                        self.end_headers()
+                        return
+                    ctype = CONTENT_TYPES.get(os.path.splitext(rel)[1], "application/octet-stream")
+                    self.send_response(200)
+                    self.send_header("Content-Type", f"{ctype}; charset=utf-8")
+                    self.send_header("Content-Length", str(st.st_size))
+                    if encoding:
+                        self.send_header("Content-Encoding", encoding)
+                    self.send_header("Vary", "Accept-Encoding")
+                    self.send_header("ETag", etag)
+                    self.send_header("Last-Modified", formatdate(st.st_mtime, usegmt=True))
+                    self.send_header("Cache-Control", REPORT_CACHE_CONTROL)
+                    self.end_headers()
+                    # Zero-copy os.sendfile where supported, plain send() otherwise
+                    sent = self.connection.sendfile(f, 0, st.st_size)
+                    if sent < st.st_size:
+                        # Truncated in place mid-send: the body is shorter than the
+                        # Content-Length sent, so the connection can't be reused.
+                        logger.warning("Short send for %s (%d of %d bytes)", rel, sent, st.st_size)
+                        self.close_connection = True
             else:
                 self.send_error(404, "Report not found")
         elif self.path == "/healthz":
             self.send_response(200)
             self.send_header("Content-Type", "text/plain")
+            self.send_header("Content-Length", "2")
             self.end_headers()
             self.wfile.write(b"ok")
         else:
@@ -181,22 +331,41 @@ class ReportHandler(SimpleHTTPRequestHandler):
         logger.info(fmt, *args)
 
 
+class PooledHTTPServer(ThreadingHTTPServer):
+    """ThreadingHTTPServer that handles connections on a fixed-size thread pool."""
+
+    def __init__(self, server_address, handler_class, workers: int = 8):
+        super().__init__(server_address, handler_class)
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="viewer")
+
+    def process_request(self, request, client_address):
+        self._pool.submit(self.process_request_thread, request, client_address)
+
+    def server_close(self):
+        super().server_close()
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+
 def main():
     parser = argparse.ArgumentParser(description="Report Viewer Web UI")
     parser.add_argument("--report-dir", type=str, default="output/analytics",
                         help="Directory containing analytics reports")
     parser.add_argument("--port", type=int, default=8080, help="HTTP port")
     parser.add_argument("--host", type=str, default="0.0.0.0", help="Bind address")
+    parser.add_argument("--workers", type=int, default=8,
+                        help="Request handler threads")
     args = parser.parse_args()
 
     ReportHandler.report_dir = os.path.abspath(args.report_dir)
-    server = HTTPServer((args.host, args.port), ReportHandler)
+    server = PooledHTTPServer((args.host, args.port), ReportHandler, workers=args.workers)
     logger.info("Report viewer running at http://%s:%d (serving %s)", args.host, args.port, args.report_dir)
     try:
         server.serve_forever()
     except KeyboardInterrupt:
         logger.info("Shutting down")
         server.shutdown()
+    finally:
+        server.server_close()
 
 
 if __name__ == "__main__":
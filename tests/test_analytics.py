@@ -13,7 +13,7 @@ from src.generator.catalog import PROCEDURES
 from src.generator.generate import generate_batch
 
 
-@pytest.fixture(scope="module")
+@pytest.fixture(scope="session")
 def sample_cases():
     """Generate a small dataset for analytics testing."""
     start = datetime(2025, 1, 6, tzinfo=timezone.utc)
@@ -21,20 +21,71 @@ def sample_cases():
     return generate_batch(start, end, seed=42)
 
 
-@pytest.fixture(scope="module")
+@pytest.fixture(scope="session")
 def sample_df(sample_cases):
     """Create a DataFrame from sample cases."""
     df = pd.DataFrame(sample_cases)
     for col in ["checkin_time", "preop_start_time", "op_start_time",
                  "postop_start_time", "discharge_time", "scheduled_start_time"]:
-        df[col] = pd.to_datetime(df[col])
+        df[col] = pd.to_datetime(df[col], format="ISO8601")
     return df
 
 
+@pytest.fixture(scope="session")
+def sample_parquet(sample_df, tmp_path_factory):
+    """Write sample_df to Parquet once for the pipeline tests."""
+    path = tmp_path_factory.mktemp("cases") / "test_cases.parquet"
+    sample_df.to_parquet(path, index=False, compression=None)
+    return str(path)
+
+
+class TestLoadData:
+    @pytest.fixture
+    def cases_csv(self, sample_cases, tmp_path):
+        path = tmp_path / "in" / "cases.csv"
+        path.parent.mkdir()
+        pd.DataFrame(sample_cases).to_csv(path, index=False)
+        return path
+
+    def test_csv_without_cache_dir_writes_nothing(self, cases_csv):
+        from src.analytics.analytics import load_data
+        df = load_data(str(cases_csv))
+        assert len(df) > 0
+        assert [p.name for p in cases_csv.parent.iterdir()] == ["cases.csv"]
+
+    def test_cache_reused_until_csv_changes(self, cases_csv, tmp_path, monkeypatch):
+        from src.analytics import analytics
+        cache_dir = tmp_path / "cache"
+        first = analytics.load_data(str(cases_csv), str(cache_dir))
+        assert len(list(cache_dir.iterdir())) == 1
+        assert [p.name for p in cases_csv.parent.iterdir()] == ["cases.csv"]
+
+        def no_parse(path):
+            raise AssertionError("CSV re-parsed despite a valid cache")
+
+        with monkeypatch.context() as m:
+            m.setattr(analytics, "_read_csv", no_parse)
+            cached = analytics.load_data(str(cases_csv), str(cache_dir))
+        pd.testing.assert_frame_equal(cached, first)
+
+        # Same mtime, different size: the recorded key no longer matches
+        st = cases_csv.stat()
+        with open(cases_csv, "a") as f:
+            f.write(cases_csv.read_text().splitlines()[1] + "\n")
+        os.utime(cases_csv, ns=(st.st_atime_ns, st.st_mtime_ns))
+        assert len(analytics.load_data(str(cases_csv), str(cache_dir))) == len(first) + 1
+
+    def test_ignores_unrelated_sibling_parquet(self, cases_csv, tmp_path):
+        from src.analytics.analytics import load_data
+        pd.DataFrame({"unrelated": [1]}).to_parquet(cases_csv.with_suffix(".parquet"))
+        df = load_data(str(cases_csv), str(tmp_path / "cache"))
+        assert "event_id" in df.columns
+
+
 class TestComputeDurations:
     def test_computes_duration_columns(self, sample_df):
         from src.analytics.analytics import compute_durations
-        df = compute_durations(sample_df.copy())
+        df = compute_durations(sample_df)
         for col in ["dur_checkin_to_preop", "dur_preop_to_op",
                      "dur_op_to_postop", "dur_postop_to_discharge", "dur_total"]:
             assert col in df.columns
@@ -44,7 +95,7 @@ class TestComputeDurations:
 
     def test_dur_total_equals_sum(self, sample_df):
         from src.analytics.analytics import compute_durations
-        df = compute_durations(sample_df.copy())
+        df = compute_durations(sample_df)
         completed = df[df["case_status"] == "completed"]
         sum_parts = (
             completed["dur_checkin_to_preop"]
@@ -54,12 +105,32 @@ class TestComputeDurations:
         )
         np.testing.assert_allclose(completed["dur_total"].values, sum_parts.values, rtol=1e-5)
 
+    def test_does_not_modify_input(self, sample_df):
+        from src.analytics.analytics import compute_durations
+        columns = list(sample_df.columns)
+        compute_durations(sample_df)
+        assert list(sample_df.columns) == columns
+
+
+class TestP90:
+    def test_matches_pandas_quantile(self):
+        from src.analytics.analytics import _p90
+        rng = np.random.default_rng(0)
+        for n in [1, 2, 3, 10, 101]:
+            values = rng.random(n)
+            assert _p90(values) == pytest.approx(pd.Series(values).quantile(0.9))
+
+    def test_ignores_nan(self):
+        from src.analytics.analytics import _p90
+        assert _p90([np.nan, 1.0, 2.0]) == pytest.approx(1.9)
+        assert np.isnan(_p90([np.nan]))
+
 
 class TestComputeAggregates:
     def test_aggregates_structure(self, sample_df):
         from src.analytics.analytics import compute_durations, compute_aggregates
-        df = compute_durations(sample_df.copy())
-        aggs = compute_aggregates(df)
+        df = compute_durations(sample_df)
+        aggs = compute_aggregates(df[df["case_status"] == "completed"])
         assert "facility_id" in aggs.columns
         assert "procedure_type" in aggs.columns
         assert "case_volume" in aggs.columns
@@ -67,8 +138,8 @@ class TestComputeAggregates:
 
     def test_late_start_rate_computed(self, sample_df):
         from src.analytics.analytics import compute_durations, compute_aggregates
-        df = compute_durations(sample_df.copy())
-        aggs = compute_aggregates(df)
+        df = compute_durations(sample_df)
+        aggs = compute_aggregates(df[df["case_status"] == "completed"])
         if "late_start_rate" in aggs.columns:
             assert aggs["late_start_rate"].between(0, 1).all()
 
@@ -76,8 +147,8 @@ class TestComputeAggregates:
 class TestGenerateInsights:
     def test_insights_generated(self, sample_df):
         from src.analytics.analytics import compute_durations, compute_aggregates, generate_insights
-        df = compute_durations(sample_df.copy())
-        aggs = compute_aggregates(df)
+        df = compute_durations(sample_df)
+        aggs = compute_aggregates(df[df["case_status"] == "completed"])
         insights = generate_insights(df, aggs)
         assert len(insights) > 0
         # Should have at least facility summaries
@@ -86,14 +157,62 @@ class TestGenerateInsights:
 
     def test_insight_messages_are_strings(self, sample_df):
         from src.analytics.analytics import compute_durations, compute_aggregates, generate_insights
-        df = compute_durations(sample_df.copy())
-        aggs = compute_aggregates(df)
+        df = compute_durations(sample_df)
+        aggs = compute_aggregates(df[df["case_status"] == "completed"])
         insights = generate_insights(df, aggs)
         for insight in insights:
             assert isinstance(insight["message"], str)
             assert len(insight["message"]) > 0
 
 
+class TestTrainBooster:
+    def test_early_stopping_does_not_see_test_rows(self, sample_df, monkeypatch):
+        from src.analytics import analytics
+        if not analytics.XGB_AVAILABLE:
+            pytest.skip("xgboost not installed")
+        df = analytics.compute_durations(sample_df)
+        prepared, feature_cols, _ = analytics.prepare_features(df[df["case_status"] == "completed"].copy())
+        X = prepared[feature_cols].astype("float32")
+        y = prepared["dur_total"].astype("float32")
+        X_train, X_test, y_train, y_test = analytics._train_test_split(X, y)
+
+        seen = {}
+        real_train = analytics.xgb.train
+
+        def spy(params, dtrain, **kwargs):
+            seen["n_fit"] = dtrain.num_row()
+            seen["n_eval"] = [d.num_row() for d, _ in kwargs["evals"]]
+            return real_train(params, dtrain, **kwargs)
+
+        monkeypatch.setattr(analytics.xgb, "train", spy)
+        params = {"objective": "reg:squarederror", "n_estimators": 10, "tree_method": "hist"}
+        _, y_pred, _, n_fit, n_val = analytics._train_booster(
+            params, X_train, y_train, X_test, y_test, feature_cols,
+        )
+
+        assert len(y_pred) == len(X_test)
+        assert (n_fit, [n_val]) == (seen["n_fit"], seen["n_eval"])
+        assert n_fit + n_val == len(X_train)
+
+    @pytest.mark.parametrize("train", ["train_discharge_predictor", "train_extended_recovery_classifier"])
+    def test_nthread_reaches_booster_params(self, sample_df, monkeypatch, train):
+        from src.analytics import analytics
+        if not analytics.XGB_AVAILABLE:
+            pytest.skip("xgboost not installed")
+        df = analytics.compute_durations(sample_df)
+        prepared, feature_cols, _ = analytics.prepare_features(df[df["case_status"] == "completed"].copy())
+        seen = {}
+        real_train = analytics.xgb.train
+
+        def spy(params, dtrain, **kwargs):
+            seen["nthread"] = params.get("nthread")
+            return real_train(params, dtrain, **kwargs)
+
+        monkeypatch.setattr(analytics.xgb, "train", spy)
+        getattr(analytics, train)(prepared, feature_cols, nthread=1)
+        assert seen["nthread"] == 1
+
+
 class TestRunAnalytics:
     def test_full_pipeline_csv(self, sample_cases, tmp_path):
         from src.analytics.analytics import run_analytics
@@ -111,15 +230,22 @@ class TestRunAnalytics:
         assert os.path.exists(os.path.join(output_dir, "aggregates.csv"))
         assert os.path.exists(os.path.join(output_dir, "analytics_results.json"))
 
-    def test_results_json_valid(self, sample_cases, tmp_path):
+    def test_writes_gzip_siblings(self, sample_parquet, tmp_path):
+        import gzip
         from src.analytics.analytics import run_analytics
 
-        df = pd.DataFrame(sample_cases)
-        csv_path = str(tmp_path / "test_cases2.csv")
-        df.to_csv(csv_path, index=False)
+        output_dir = tmp_path / "analytics_output3"
+        run_analytics(sample_parquet, str(output_dir))
+
+        for name in ("analytics_results.json", "report.html"):
+            plain = (output_dir / name).read_bytes()
+            assert gzip.decompress((output_dir / f"{name}.gz").read_bytes()) == plain
+
+    def test_results_json_valid(self, sample_parquet, tmp_path):
+        from src.analytics.analytics import run_analytics
 
         output_dir = str(tmp_path / "analytics_output2")
-        run_analytics(csv_path, output_dir)
+        run_analytics(sample_parquet, output_dir)
 
         with open(os.path.join(output_dir, "analytics_results.json")) as f:
             data = json.load(f)
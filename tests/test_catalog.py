@@ -2,6 +2,7 @@
 
 import pytest
 from src.generator.catalog import (
+    ANESTHESIA_TABLES,
     ANESTHESIA_TYPES,
     FACILITIES,
     PROCEDURES,
@@ -24,6 +25,12 @@ class TestProcedureCatalog:
         for sl in SERVICE_LINES:
             assert sl in ANESTHESIA_TYPES, f"Missing anesthesia types for {sl}"
 
+    def test_anesthesia_tables_match_types(self):
+        for sl, choices in ANESTHESIA_TYPES.items():
+            names, cum = ANESTHESIA_TABLES[sl]
+            assert names == tuple(name for name, _ in choices)
+            assert cum[-1] == pytest.approx(sum(w for _, w in choices))
+
     def test_anesthesia_weights_sum_to_one(self):
         for sl, choices in ANESTHESIA_TYPES.items():
             total = sum(w for _, w in choices)
@@ -48,3 +48,153 @@ class TestETLWatermark:
         mock_conn.cursor.return_value.__exit__ = MagicMock(return_value=False)
         result = get_watermark(mock_conn, "test-source")
         assert result == ts
+
+
+class TestInsertRows:
+    @patch("src.etl.batch_etl.psycopg2")
+    def test_empty_batch_skips_db(self, mock_pg):
+        from src.etl.batch_etl import insert_rows
+        mock_conn = MagicMock()
+        assert insert_rows(mock_conn, []) == 0
+        mock_conn.cursor.assert_not_called()
+
+    @patch("src.etl.batch_etl.psycopg2")
+    def test_multi_row_insert_counts_returned_rows(self, mock_pg):
+        from src.etl.batch_etl import insert_rows
+        mock_conn = MagicMock()
+        mock_cursor = MagicMock()
+        mock_conn.cursor.return_value.__enter__ = lambda s: mock_cursor
+        mock_conn.cursor.return_value.__exit__ = MagicMock(return_value=False)
+        mock_pg.extras.execute_values.return_value = [(1,), (1,)]
+        rows = [{col: f"{col}-{i}" for col in TRANSFER_COLUMNS} for i in range(3)]
+
+        assert insert_rows(mock_conn, rows) == 2
+        cur, query, values = mock_pg.extras.execute_values.call_args.args
+        assert cur is mock_cursor
+        assert "VALUES %s" in query and "ON CONFLICT (event_id) DO NOTHING" in query
+        assert values[1] == tuple(f"{col}-1" for col in TRANSFER_COLUMNS)
+
+
+class TestCopyRows:
+    def test_copy_field_escapes_text_format(self):
+        from src.etl.batch_etl import _copy_field
+        assert _copy_field(None) == "\\N"
+        assert _copy_field(3) == "3"
+        assert _copy_field("a\tb\\c\nd") == "a\\tb\\\\c\\nd"
+        ts = datetime(2025, 1, 6, 12, 0, 0, tzinfo=timezone.utc)
+        assert _copy_field(ts) == "2025-01-06T12:00:00+00:00"
+
+    def test_copy_then_merge_from_stage(self):
+        from src.etl.batch_etl import copy_rows
+        mock_conn = MagicMock()
+        mock_cursor = MagicMock()
+        mock_cursor.rowcount = 2
+        mock_conn.cursor.return_value.__enter__ = lambda s: mock_cursor
+        mock_conn.cursor.return_value.__exit__ = MagicMock(return_value=False)
+        copied = []
+        mock_cursor.copy_expert.side_effect = lambda sql, f: copied.append(f.read())
+        rows = [dict.fromkeys(TRANSFER_COLUMNS, "x") for _ in range(2)]
+        rows[1]["scheduled_start_time"] = None
+
+        assert copy_rows(mock_conn, rows) == 2
+        lines = copied[0].splitlines()
+        assert len(lines) == 2
+        assert lines[1].split("\t")[TRANSFER_COLUMNS.index("scheduled_start_time")] == "\\N"
+        merge_sql = mock_cursor.execute.call_args.args[0]
+        assert merge_sql.startswith("INSERT INTO outpatient_case_event")
+        assert "ON CONFLICT (event_id) DO NOTHING" in merge_sql
+
+
+class TestTransferBinary:
+    def test_pipes_edge_copy_into_central_stage(self):
+        from src.etl.batch_etl import transfer_binary
+        edge_conn, central_conn = MagicMock(), MagicMock()
+        edge_cur, central_cur = MagicMock(), MagicMock()
+        edge_conn.cursor.return_value.__enter__ = lambda s: edge_cur
+        edge_conn.cursor.return_value.__exit__ = MagicMock(return_value=False)
+        central_conn.cursor.return_value.__enter__ = lambda s: central_cur
+        central_conn.cursor.return_value.__exit__ = MagicMock(return_value=False)
+        edge_cur.copy_expert.side_effect = lambda sql, f: f.write(b"PGCOPY-payload")
+        received = []
+        central_cur.copy_expert.side_effect = lambda sql, f: received.append(f.read())
+        ts = datetime(2025, 1, 6, 12, 0, 0, tzinfo=timezone.utc)
+        central_cur.fetchone.return_value = (ts,)
+        central_cur.rowcount = 5
+
+        inserted, last_created = transfer_binary(edge_conn, central_conn, None)
+
+        assert (inserted, last_created) == (5, ts)
+        assert received == [b"PGCOPY-payload"]
+        assert "FORMAT binary" in edge_cur.copy_expert.call_args.args[0]
+        assert "FORMAT binary" in central_cur.copy_expert.call_args.args[0]
+
+
+class TestRunEtlCommits:
+    def test_commits_every_n_batches_plus_final(self):
+        from src.etl import batch_etl
+        central_conn = MagicMock()
+        ts = datetime(2025, 1, 6, 12, 0, 0, tzinfo=timezone.utc)
+        batches = [[{"created_at": ts}]] * 5
+        with patch.object(batch_etl, "get_connection", side_effect=[MagicMock(), central_conn]), \
+                patch.object(batch_etl, "get_watermark", return_value=None), \
+                patch.object(batch_etl, "update_watermark") as update_watermark, \
+                patch.object(batch_etl, "fetch_new_rows", return_value=iter(batches)), \
+                patch.dict(batch_etl.LOAD_METHODS, {"copy": MagicMock(return_value=1)}):
+            batch_etl.run_etl("e", 1, "d", "u", "p", "c", 2, "d", "u", "p", commit_every=2)
+
+        assert central_conn.autocommit is False
+        assert central_conn.commit.call_count == 3
+        update_watermark.assert_called_once_with(central_conn, "edge-collector", ts, 5)
+
+    def test_skips_transfer_when_edge_has_nothing_new(self):
+        from src.etl import batch_etl
+        ts = datetime(2025, 1, 6, 12, 0, 0, tzinfo=timezone.utc)
+        with patch.object(batch_etl, "get_connection", side_effect=[MagicMock(), MagicMock()]), \
+                patch.object(batch_etl, "get_watermark", return_value=ts), \
+                patch.object(batch_etl, "edge_max_created", return_value=ts), \
+                patch.object(batch_etl, "fetch_new_rows") as fetch_new_rows:
+            assert batch_etl.run_etl("e", 1, "d", "u", "p", "c", 2, "d", "u", "p") == 0
+
+        fetch_new_rows.assert_not_called()
+
+    @pytest.mark.parametrize("commit_every", [0, -1])
+    def test_rejects_commit_every_below_one(self, commit_every):
+        from src.etl import batch_etl
+        with patch.object(batch_etl, "get_connection") as get_connection:
+            with pytest.raises(ValueError, match="commit_every"):
+                batch_etl.run_etl("e", 1, "d", "u", "p", "c", 2, "d", "u", "p",
+                                  commit_every=commit_every)
+        get_connection.assert_not_called()
+
+    def test_cli_rejects_commit_every_zero(self, capsys):
+        from src.etl import batch_etl
+        with patch.object(batch_etl.sys, "argv", ["batch_etl", "--commit-every", "0"]), \
+                patch.object(batch_etl, "run_etl") as run_etl:
+            with pytest.raises(SystemExit):
+                batch_etl.main()
+        run_etl.assert_not_called()
+        assert "--commit-every must be at least 1" in capsys.readouterr().err
+
+
+class TestPrefetch:
+    def test_preserves_order(self):
+        from src.etl.batch_etl import prefetch
+        assert list(prefetch(iter(range(10)))) == list(range(10))
+
+    def test_reraises_producer_error(self):
+        from src.etl.batch_etl import prefetch
+
+        def batches():
+            yield [1]
+            raise RuntimeError("edge went away")
+
+        gen = prefetch(batches())
+        assert next(gen) == [1]
+        with pytest.raises(RuntimeError, match="edge went away"):
+            next(gen)
+
+    def test_consumer_can_stop_early(self):
+        from src.etl.batch_etl import prefetch
+        gen = prefetch(iter(range(100)), depth=1)
+        assert next(gen) == 0
+        gen.close()
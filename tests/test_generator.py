@@ -12,6 +12,7 @@ from src.generator.generate import (
     write_csv,
     write_json,
     _sample_lognormal,
+    _sample_durations,
     _weighted_choice,
     _build_procedure_weights,
 )
@@ -33,12 +34,37 @@ class TestHelpers:
         for _ in range(50):
             assert _weighted_choice(items, weights, rng) == "b"
 
+    def test_checkin_hours_skip_zero_weight_hours(self):
+        from src.generator.generate import CHECKIN_CUM, CHECKIN_HOURS, CHECKIN_HOUR_WEIGHTS, _pick_cumulative
+        rng = random.Random(42)
+        hours = {_pick_cumulative(CHECKIN_HOURS, CHECKIN_CUM, rng) for _ in range(2000)}
+        assert all(CHECKIN_HOUR_WEIGHTS[h] > 0 for h in hours)
+
     def test_sample_lognormal_within_bounds(self):
         rng = random.Random(42)
         for _ in range(100):
             val = _sample_lognormal(3.0, 0.4, rng, min_val=3.0, max_val=600.0)
             assert 3.0 <= val <= 600.0
 
+    def test_sample_durations_shape_and_bounds(self):
+        import numpy as np
+        rng = np.random.default_rng(42)
+        idx = np.arange(len(PROCEDURES)).repeat(20)
+        out = _sample_durations(idx, rng)
+        assert out.shape == (len(idx), 4)
+        assert out.min() >= 3.0 and out.max() <= 600.0
+
+    def test_uuid4_strings_are_valid_v4(self):
+        import uuid
+        import numpy as np
+        from src.generator.generate import _uuid4_strings
+        ids = _uuid4_strings(np.random.default_rng(1), 50)
+        assert len(set(ids)) == 50
+        for s in ids:
+            u = uuid.UUID(s)
+            assert str(u) == s
+            assert u.version == 4 and u.variant == uuid.RFC_4122
+
     def test_build_procedure_weights(self):
         procs, weights = _build_procedure_weights("HOSP_A")
         assert len(procs) == len(PROCEDURES)
@@ -117,6 +143,15 @@ class TestGenerateDay:
         vol_min, vol_max = FACILITIES["HOSP_A"]["daily_volume"]
         assert vol_min <= len(cases) <= vol_max
 
+    def test_accepts_numpy_generator(self):
+        import numpy as np
+        base = datetime(2025, 1, 6, tzinfo=timezone.utc)
+        cases1 = generate_day("HOSP_C", base, np.random.Generator(np.random.SFC64(7)))
+        cases2 = generate_day("HOSP_C", base, np.random.Generator(np.random.SFC64(7)))
+        vol_min, vol_max = FACILITIES["HOSP_C"]["daily_volume"]
+        assert vol_min <= len(cases1) <= vol_max
+        assert cases1 == cases2
+
     def test_all_cases_have_same_facility(self):
         rng = random.Random(42)
         base = datetime(2025, 1, 6, tzinfo=timezone.utc)
@@ -141,6 +176,11 @@ class TestGenerateBatch:
         assert len(cases1) == len(cases2)
         assert cases1[0]["event_id"] == cases2[0]["event_id"]
 
+    def test_parallel_matches_serial(self):
+        start = datetime(2025, 1, 6, tzinfo=timezone.utc)
+        end = datetime(2025, 1, 7, tzinfo=timezone.utc)
+        assert generate_batch(start, end, seed=42, workers=2) == generate_batch(start, end, seed=42)
+
     def test_skips_weekends(self):
         # Jan 11-12, 2025 are Sat-Sun
         start = datetime(2025, 1, 11, tzinfo=timezone.utc)
@@ -163,6 +203,43 @@ class TestWriteOutput:
             rows = list(reader)
         assert len(rows) == 10
 
+    def test_write_csv_without_pyarrow(self, tmp_path, monkeypatch):
+        from src.generator import generate
+        monkeypatch.setattr(generate, "pa", None)
+        rng = random.Random(42)
+        base = datetime(2025, 1, 6, tzinfo=timezone.utc)
+        cases = [generate_case("HOSP_A", base, PROCEDURES[0], rng) for _ in range(10)]
+        path = str(tmp_path / "test.csv")
+        write_csv(cases, path)
+        import csv
+        with open(path) as f:
+            rows = list(csv.DictReader(f))
+        assert rows[0]["event_id"] == cases[0]["event_id"]
+        assert rows[-1]["asa_class"] == str(cases[-1]["asa_class"])
+
+    def test_write_csv_gzip(self, tmp_path):
+        rng = random.Random(42)
+        base = datetime(2025, 1, 6, tzinfo=timezone.utc)
+        cases = [generate_case("HOSP_A", base, PROCEDURES[0], rng) for _ in range(10)]
+        path = str(tmp_path / "test.csv.gz")
+        write_csv(cases, path)
+        import csv
+        import gzip
+        with gzip.open(path, "rt", newline="") as f:
+            rows = list(csv.DictReader(f))
+        assert [r["event_id"] for r in rows] == [c["event_id"] for c in cases]
+
+    def test_write_csv_batches_matches_write_csv(self, tmp_path):
+        from src.generator.generate import generate_batch, iter_batches, write_csv_batches
+        start = datetime(2025, 1, 6, tzinfo=timezone.utc)
+        end = datetime(2025, 1, 7, tzinfo=timezone.utc)
+        flat_path = tmp_path / "flat.csv"
+        stream_path = tmp_path / "stream.csv"
+        write_csv(generate_batch(start, end, seed=3), str(flat_path))
+        total = write_csv_batches(iter_batches(start, end, seed=3), str(stream_path))
+        assert total == len(generate_batch(start, end, seed=3))
+        assert stream_path.read_bytes() == flat_path.read_bytes()
+
     def test_write_json(self, tmp_path):
         rng = random.Random(42)
         proc = PROCEDURES[0]
@@ -0,0 +1,95 @@
+"""Tests for the HTML report generator."""
+
+import pytest
+from datetime import datetime, timezone
+
+import pandas as pd
+
+from src.generator.generate import generate_batch
+
+
+@pytest.fixture(scope="module")
+def aggs_without_late_start():
+    """Aggregates computed from cases that have no scheduled start times."""
+    from src.analytics.analytics import compute_aggregates, compute_durations
+    start = datetime(2025, 1, 6, tzinfo=timezone.utc)
+    df = pd.DataFrame(generate_batch(start, start, seed=7)).drop(columns=["scheduled_start_time"])
+    df = compute_durations(df)
+    aggs = compute_aggregates(df[df["case_status"] == "completed"])
+    assert "late_start_rate" not in aggs.columns
+    return aggs
+
+
+class TestLoadAggs:
+    @pytest.mark.parametrize("fmt", ["csv", "parquet"])
+    def test_report_renders_without_late_start_rate(self, aggs_without_late_start, tmp_path, fmt):
+        from src.analytics.report import _load_aggs, build_report
+        csv_path = tmp_path / "aggregates.csv"
+        aggs_without_late_start.to_csv(csv_path, index=False)
+        if fmt == "parquet":
+            aggs_without_late_start.to_parquet(tmp_path / "aggregates.parquet", index=False)
+        aggs = _load_aggs(str(csv_path))
+        assert "late_start_rate" not in aggs.columns
+        html = build_report({"timestamp": "2025-01-06T00:00:00+00:00", "insights": []}, aggs)
+        assert html.startswith("<!DOCTYPE html>")
+        assert html.rstrip().endswith("</html>")
+
+
+class TestMinifyCss:
+    def test_collapses_whitespace_and_comments(self):
+        from src.analytics.report import _minify_css
+        css = "a , b > c {\n  color : red ;\n  /* note */\n}\n/* end */ d  e { margin: 0 }"
+        assert _minify_css(css) == "a,b>c{color:red}d e{margin:0}"
+
+    def test_quoted_strings_untouched(self):
+        from src.analytics.report import _minify_css
+        css = """p::after { content: " ; }  /* not a comment */ " ; font-family: 'Segoe UI' , x ; }"""
+        assert _minify_css(css) == """p::after{content:" ; }  /* not a comment */ ";font-family:'Segoe UI',x}"""
+
+
+class TestInlineScript:
+    def test_escapes_closing_tag_in_any_case(self):
+        from src.analytics.report import _inline_script
+        html = _inline_script('var a = "</script>", b = "</SCRIPT>", c = "</Script >";')
+        assert html == '<script>var a = "<\\/script>", b = "<\\/SCRIPT>", c = "<\\/Script >";</script>'
+        assert html.lower().count("</script") == 1
+
+
+class TestAtomicOpen:
+    def test_failed_write_keeps_previous_file(self, tmp_path):
+        from src.analytics.report import atomic_open
+        path = tmp_path / "report.html"
+        path.write_text("old")
+        with pytest.raises(RuntimeError):
+            with atomic_open(str(path)) as f:
+                f.write("partial")
+                raise RuntimeError("render failed")
+        assert path.read_text() == "old"
+        assert [p.name for p in tmp_path.iterdir()] == ["report.html"]
+
+    def test_replaces_on_success(self, tmp_path):
+        from src.analytics.report import atomic_open
+        path = tmp_path / "report.html"
+        path.write_text("old")
+        with atomic_open(str(path)) as f:
+            f.write("new")
+        assert path.read_text() == "new"
+
+
+class TestMain:
+    def test_gzip_writes_plain_html_and_sibling(self, aggs_without_late_start, tmp_path, monkeypatch):
+        import gzip
+        import json
+        from src.analytics import report
+        results = tmp_path / "analytics_results.json"
+        results.write_text(json.dumps({"timestamp": "2025-01-06T00:00:00+00:00", "insights": []}))
+        aggregates = tmp_path / "aggregates.csv"
+        aggs_without_late_start.to_csv(aggregates, index=False)
+        out = tmp_path / "out" / "report.html"
+        monkeypatch.setattr("sys.argv", [
+            "report", "--results", str(results), "--aggregates", str(aggregates),
+            "--output", str(out), "--gzip", "--no-cache",
+        ])
+        report.main()
+        assert sorted(p.name for p in out.parent.iterdir()) == ["report.html", "report.html.gz"]
+        assert gzip.decompress((out.parent / "report.html.gz").read_bytes()) == out.read_bytes()
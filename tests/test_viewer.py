@@ -0,0 +1,156 @@
+"""Tests for the report viewer HTTP handler."""
+
+import gzip
+import http.client
+import os
+import socket
+import threading
+
+import pytest
+
+
+@pytest.fixture
+def report_dir(tmp_path):
+    root = tmp_path / "reports"
+    (root / "sub").mkdir(parents=True)
+    (root / "report.html").write_text("<p>report</p>" * 50)
+    (root / "results.json").write_text('{"a": 1}')
+    (root / "sub" / "nested.html").write_text("<p>nested</p>")
+    outside = tmp_path / "outside"
+    outside.mkdir()
+    (outside / "secret.html").write_text("secret")
+    return root
+
+
+@pytest.fixture
+def server(report_dir, monkeypatch):
+    from src.viewer.app import PooledHTTPServer, ReportHandler
+    monkeypatch.setattr(ReportHandler, "report_dir", str(report_dir))
+    srv = PooledHTTPServer(("127.0.0.1", 0), ReportHandler, workers=2)
+    thread = threading.Thread(target=srv.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True)
+    thread.start()
+    yield srv
+    srv.shutdown()
+    srv.server_close()
+
+
+def _get(server, path, headers=None):
+    conn = http.client.HTTPConnection("127.0.0.1", server.server_address[1], timeout=5)
+    conn.request("GET", path, headers=headers or {})
+    resp = conn.getresponse()
+    body = resp.read()
+    conn.close()
+    return resp, body
+
+
+class TestShortSend:
+    def test_connection_closed_when_file_shrinks(self, server, report_dir, monkeypatch):
+        real_sendfile = socket.socket.sendfile
+
+        def short_sendfile(self, file, offset=0, count=None):
+            return real_sendfile(self, file, offset, count - 10)
+
+        monkeypatch.setattr(socket.socket, "sendfile", short_sendfile)
+        size = (report_dir / "report.html").stat().st_size
+        with socket.create_connection(server.server_address, timeout=3) as sock:
+            sock.sendall(b"GET /reports/report.html HTTP/1.1\r\nHost: x\r\n\r\n")
+            data = b""
+            while chunk := sock.recv(65536):
+                data += chunk
+        head, _, body = data.partition(b"\r\n\r\n")
+        assert f"Content-Length: {size}".encode() in head
+        assert len(body) == size - 10
+
+
+class TestTraversalGuard:
+    def test_serves_top_level_and_nested(self, server):
+        assert _get(server, "/reports/report.html")[0].status == 200
+        resp, body = _get(server, "/reports/sub/nested.html")
+        assert resp.status == 200
+        assert body == b"<p>nested</p>"
+
+    @pytest.mark.parametrize("path", [
+        "/reports/../outside/secret.html",
+        "/reports/sub/../../outside/secret.html",
+        "/reports/..",
+    ])
+    def test_rejects_dotdot(self, server, path):
+        assert _get(server, path)[0].status == 404
+
+    def test_rejects_absolute_path(self, server, tmp_path):
+        path = "/reports/" + str(tmp_path / "outside" / "secret.html")
+        assert _get(server, path)[0].status == 404
+
+    def test_rejects_symlinked_directory_escaping_root(self, server, report_dir, tmp_path):
+        os.symlink(tmp_path / "outside", report_dir / "link")
+        assert _get(server, "/reports/link/secret.html")[0].status == 404
+
+    def test_rejects_symlinked_leaf_file(self, server, report_dir, tmp_path):
+        os.symlink(tmp_path / "outside" / "secret.html", report_dir / "leak.html")
+        assert _get(server, "/reports/leak.html")[0].status == 404
+
+    def test_rejects_directory(self, server):
+        assert _get(server, "/reports/sub")[0].status == 404
+
+
+class TestConditionalGet:
+    def test_matching_etag_returns_304(self, server):
+        resp, _ = _get(server, "/reports/report.html")
+        etag = resp.getheader("ETag")
+        assert etag and resp.getheader("Last-Modified")
+        resp, body = _get(server, "/reports/report.html", {"If-None-Match": etag})
+        assert resp.status == 304
+        assert body == b""
+
+    @pytest.mark.parametrize("header", ["*", 'W/"other", {etag}', '"other",{etag}'])
+    def test_etag_list_and_wildcard_match(self, server, header):
+        etag = _get(server, "/reports/report.html")[0].getheader("ETag")
+        resp, _ = _get(server, "/reports/report.html", {"If-None-Match": header.format(etag=etag)})
+        assert resp.status == 304
+
+    def test_non_matching_etag_returns_body(self, server, report_dir):
+        resp, body = _get(server, "/reports/report.html", {"If-None-Match": '"stale"'})
+        assert resp.status == 200
+        assert body == (report_dir / "report.html").read_bytes()
+
+    def test_etag_changes_when_file_changes(self, server, report_dir):
+        etag = _get(server, "/reports/report.html")[0].getheader("ETag")
+        (report_dir / "report.html").write_text("<p>rewritten</p>")
+        resp, _ = _get(server, "/reports/report.html", {"If-None-Match": etag})
+        assert resp.status == 200
+
+
+class TestGzipSibling:
+    def _write_sibling(self, report_dir, age):
+        plain = report_dir / "results.json"
+        gz = report_dir / "results.json.gz"
+        gz.write_bytes(gzip.compress(plain.read_bytes()))
+        st = plain.stat()
+        os.utime(gz, ns=(st.st_atime_ns, st.st_mtime_ns + age))
+
+    def test_fresh_sibling_served_when_gzip_accepted(self, server, report_dir):
+        self._write_sibling(report_dir, age=1)
+        resp, body = _get(server, "/reports/results.json", {"Accept-Encoding": "gzip, br"})
+        assert resp.getheader("Content-Encoding") == "gzip"
+        assert resp.getheader("Vary") == "Accept-Encoding"
+        assert gzip.decompress(body) == b'{"a": 1}'
+
+    def test_stale_sibling_ignored(self, server, report_dir):
+        self._write_sibling(report_dir, age=-10**9)
+        resp, body = _get(server, "/reports/results.json", {"Accept-Encoding": "gzip"})
+        assert resp.getheader("Content-Encoding") is None
+        assert body == b'{"a": 1}'
+
+    @pytest.mark.parametrize("accept", [None, "identity", "gzip;q=0", "br"])
+    def test_plain_when_gzip_not_accepted(self, server, report_dir, accept):
+        self._write_sibling(report_dir, age=1)
+        resp, body = _get(server, "/reports/results.json",
+                          {"Accept-Encoding": accept} if accept else {})
+        assert resp.getheader("Content-Encoding") is None
+        assert body == b'{"a": 1}'
+
+    def test_encodings_have_distinct_etags(self, server, report_dir):
+        self._write_sibling(report_dir, age=1)
+        plain = _get(server, "/reports/results.json")[0].getheader("ETag")
+        packed = _get(server, "/reports/results.json", {"Accept-Encoding": "gzip"})[0].getheader("ETag")
+        assert plain != packed